@@ -4,122 +4,186 @@ Flask Application for Real-Time Traffic Accident Detection
 
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 import time
 import threading
-from datetime import datetime
+import numpy as np
 
 from config import Config
+from utils.clock import make_clock
 from utils.data_simulator import TrafficSimulator
+from utils.accident_registry import AccidentRegistry
+from utils.accident_history import AccidentHistory
+from utils.delta_encoder import DeltaEncoder
+from utils.ndjson_ingest import NDJSONReader
+from utils.ring_buffer import to_epoch
+from utils.scheduler import TickScheduler
+from utils.snapshot import DetectorSnapshotter
+from utils.metrics import metrics
 from models.sequential_estimators import AccidentDetector
+from models.arima_executor import ARIMAFitExecutor
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app)
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Initialize SocketIO (packet encoding is timed and sized when metrics are on)
+socketio_options = {'json': metrics.json_module()} if metrics.enabled else {}
+socketio = SocketIO(app, cors_allowed_origins="*", **socketio_options)
 
 # Initialize components
-simulator = TrafficSimulator()
-detector = AccidentDetector()
+clock = make_clock()
+simulator = TrafficSimulator(clock=clock)
+fit_executor = ARIMAFitExecutor() if Config.ARIMA_FIT_WORKERS > 0 else None
+detector = AccidentDetector(fit_executor=fit_executor)
+delta_encoder = DeltaEncoder()
+scheduler = TickScheduler(clock)
+# Serializes detector updates from the simulator worker and /api/ingest requests
+detector_lock = threading.Lock()
+# Periodic detector state snapshots; the last one is restored at startup
+snapshotter = DetectorSnapshotter(detector, clock) if Config.SNAPSHOT_PATH else None
+if snapshotter is not None:
+    restored = snapshotter.restore()
+    if restored and 'skipped' in restored:
+        print(f"Detector snapshot {snapshotter.path} not restored, starting cold: {restored['skipped']}")
+    elif restored:
+        print(f"Detector snapshot: {restored}")
 
 # Global state
-active_accidents = []
-accident_history = []
+active_accidents = AccidentRegistry()
+accident_history = AccidentHistory()  # cleared accidents, persisted
 simulation_running = False
 
 
+def update_registry(detection_results, speed_batch, user_report=None):
+    """
+    Register new accidents and clear released ones, emitting socket alerts
+    Returns: number of newly registered accidents
+    """
+    # Only new detections and cars with a registered accident can change the registry
+    rows = set(np.flatnonzero(detection_results.accident_detected).tolist())
+    for car_id in active_accidents.by_car:
+        row = detection_results.position(car_id)
+        if row is not None:
+            rows.add(row)
+    
+    # Update accident registry for those cars
+    detected = 0
+    for i in sorted(rows):
+        result = detection_results.record(i)
+        car_id = result['car_id']
+        
+        # Clear the car's registered accident once the detector releases it
+        current = active_accidents.for_car(car_id)
+        if current is not None and (not result['accident_active'] or
+                                    result['accident_id'] != current['id']):
+            active_accidents.clear(current['id'])
+            current['status'] = 'cleared'
+            current['cleared_at'] = result['timestamp']
+            accident_history.append(current)
+            
+            # Emit clearance notification
+            socketio.emit('accident_cleared', {
+                'id': current['id'],
+                'car_id': car_id,
+                'cleared_at': result['timestamp']
+            })
+        
+        if result['accident_detected'] and result['accident_id'] not in active_accidents:
+            # New accident detected for this car
+            accident = {
+                'id': result['accident_id'],
+                'car_id': car_id,
+                'location': {
+                    'lat': _coordinate(speed_batch.lat[i]),
+                    'lon': _coordinate(speed_batch.lon[i])
+                },
+                'detected_at': result['timestamp'],
+                'initial_speed': result['speed'],
+                'detection_methods': ['CUSUM', 'SPRT', 'Page-Hinkley'],  # Simplified
+                'confidence': result['confidence'],
+                'status': 'active'
+            }
+            
+            if user_report and user_report.get('car_id') == car_id:
+                accident['detection_methods'].append('User Report')
+            
+            active_accidents.add(accident)
+            detected += 1
+            
+            # Emit accident alert
+            socketio.emit('accident_alert', accident)
+    
+    return detected
+
+
+def _coordinate(value):
+    """Batch coordinate as a JSON-ready float, None when the feed had no location"""
+    return None if np.isnan(value) else float(value)
+
+
 def data_stream_worker():
     """
     Background worker that generates and processes data
-    Runs every UPDATE_INTERVAL seconds
+    Runs every UPDATE_INTERVAL seconds, on absolute tick deadlines
     """
     global simulation_running
     
+    scheduler.start()
     while simulation_running:
         try:
-            # Generate speed data for ALL cars (returns list)
-            speed_data_list = simulator.generate_speed_data()
+            timer = metrics.timer('traffic_tick_stage_seconds')
+            
+            # Generate speed data for ALL cars (columnar batch)
+            speed_batch = simulator.generate_speed_batch()
             
             # Generate user report (may be None)
             user_report = simulator.generate_user_report()
+            timer.lap('generate')
             
-            # Process through detector (returns list of results)
-            detection_results = detector.process_speed(speed_data_list)
-            
-            # Check each car for new accidents
-            for i, result in enumerate(detection_results):
-                car_id = result['car_id']
-                
-                if result['accident_detected'] and not any(
-                    a['id'] == result['accident_id'] for a in active_accidents
-                ):
-                    # New accident detected for this car
-                    accident = {
-                        'id': result['accident_id'],
-                        'car_id': car_id,
-                        'location': speed_data_list[i]['location'],
-                        'detected_at': result['timestamp'],
-                        'initial_speed': result['speed'],
-                        'detection_methods': ['CUSUM', 'SPRT', 'Page-Hinkley'],  # Simplified
-                        'confidence': result['confidence'],
-                        'status': 'active'
-                    }
-                    
-                    if user_report and user_report.get('car_id') == car_id:
-                        accident['detection_methods'].append('User Report')
-                    
-                    active_accidents.append(accident)
-                    
-                    # Emit accident alert
-                    socketio.emit('accident_alert', accident)
+            # Process through detector (columnar results, row-aligned with the batch)
+            with detector_lock:
+                detection_results = detector.process_batch(speed_batch)
+            timer.lap('detect')
             
-            # Check for cleared accidents
-            cleared_ids = []
-            for accident in active_accidents:
-                # Find corresponding detection result
-                car_result = next((r for r in detection_results if r.get('accident_id') == accident['id']), None)
-                if car_result and not car_result['accident_active']:
-                    accident['status'] = 'cleared'
-                    accident['cleared_at'] = car_result['timestamp']
-                    accident_history.append(accident)
-                    cleared_ids.append(accident['id'])
-                    
-                    # Emit clearance notification
-                    socketio.emit('accident_cleared', {
-                        'id': accident['id'],
-                        'car_id': accident['car_id'],
-                        'cleared_at': car_result['timestamp']
-                    })
+            # Copy a budgeted share of detector state into the next snapshot
+            if snapshotter is not None:
+                with detector_lock:
+                    snapshotter.step()
+                timer.lap('snapshot')
             
-            # Remove cleared accidents
-            active_accidents[:] = [a for a in active_accidents if a['id'] not in cleared_ids]
+            update_registry(detection_results, speed_batch, user_report)
+            timer.lap('registry')
             
-            # Prepare update payload with ALL car data
-            update_data = {
-                'timestamp': detection_results[0]['timestamp'] if detection_results else datetime.now().isoformat(),
-                'cars': detection_results,  # List of all car states
-                'active_accidents': active_accidents,
-                'user_report': user_report,
-                'simulator_status': simulator.get_status()
-            }
+            # Prepare update payload (keyframe or changes since last broadcast)
+            update_data = delta_encoder.encode(
+                timestamp=detection_results.timestamp_iso[0] if len(detection_results) else clock.now().isoformat(),
+                cars=detection_results,
+                active_accidents=active_accidents.to_list(),
+                user_report=user_report,
+                simulator_status=simulator.get_status()
+            )
+            timer.lap('encode')
             
-            # Emit update to all connected clients
+            # Emit update to all connected clients (includes JSON encoding)
             socketio.emit('traffic_update', update_data)
+            timer.lap('emit')
+            timer.total('traffic_tick_seconds')
             
-            # Sleep for update interval
-            time.sleep(Config.UPDATE_INTERVAL / Config.SIMULATION_SPEED)
+            # Sleep until the next tick deadline (a virtual clock just advances)
+            scheduler.wait()
             
         except Exception as e:
             print(f"Error in data stream: {e}")
             import traceback
             traceback.print_exc()
-            time.sleep(1)
+            # Back off until the next tick deadline (a virtual clock just advances)
+            scheduler.wait()
 
 
 @app.route('/')
@@ -131,25 +195,161 @@ def index():
 @app.route('/api/status')
 def get_status():
     """Get current system status"""
+    # /api/ingest may be adding cars from a native thread
+    with detector_lock:
+        detector_status = detector.get_status()
     return jsonify({
         'simulation_running': simulation_running,
-        'active_accidents': active_accidents,
-        'detector_status': detector.get_status(),
+        'active_accidents': active_accidents.to_list(),
+        'detector_status': detector_status,
+        'fit_executor_status': fit_executor.get_status() if fit_executor else None,
+        'scheduler_status': scheduler.get_status(),
+        'snapshot_status': snapshotter.get_status() if snapshotter else None,
         'simulator_status': simulator.get_status(),
         'config': {
             'update_interval': Config.UPDATE_INTERVAL,
             'simulation_speed': Config.SIMULATION_SPEED,
+            'clock': 'virtual' if clock.virtual else 'system',
             'cusum_threshold': Config.CUSUM_THRESHOLD,
             'sprt_threshold': Config.SPRT_THRESHOLD_UPPER
         }
     })
 
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus scrape endpoint: tick/detector stage histograms, emit sizes and counts"""
+    scheduler_status = scheduler.get_status()
+    metrics.set('traffic_cars', simulator.num_cars)
+    with detector_lock:
+        metrics.set('traffic_detector_cars', len(detector.detectors))
+    metrics.set('traffic_active_accidents', len(active_accidents))
+    metrics.set('traffic_accidents_cleared', active_accidents.cleared)
+    metrics.set('traffic_tick_overruns', scheduler_status['overruns'])
+    metrics.set('traffic_tick_utilization', scheduler_status['utilization'] or 0.0)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/history')
 def get_history():
-    """Get accident history"""
+    """
+    Get accident history, newest first, one page at a time
+    Query parameters (all optional): limit, before (next_before of the previous
+    page), car_id, since/until (ISO time or epoch seconds), bbox (min_lat,min_lon,max_lat,max_lon)
+    """
+    args = request.args
+    try:
+        since = _time_param(args, 'since')
+        until = _time_param(args, 'until')
+        if since is not None and until is not None and since > until:
+            raise ValueError('since must not be after until')
+        car_id = args.get('car_id')
+        if car_id is not None and not car_id:
+            raise ValueError('car_id must not be empty')
+        entries, next_before = accident_history.query(
+            limit=_int_param(args, 'limit', 1, Config.HISTORY_MAX_PAGE),
+            before=_int_param(args, 'before', 1),
+            car_id=car_id,
+            since=since,
+            until=until,
+            bbox=_bbox_param(args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'history': entries,
+        'next_before': next_before,
+        'total': len(accident_history)
+    })
+
+
+def _int_param(args, name, minimum, maximum=None):
+    """Integer query parameter within [minimum, maximum], None when absent"""
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got '{value}'")
+    if number < minimum or (maximum is not None and number > maximum):
+        bound = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise ValueError(f"{name} must be {bound}, got {number}")
+    return number
+
+
+def _time_param(args, name):
+    """ISO timestamp or epoch seconds query parameter, None when absent"""
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        epoch = float(value)
+    except ValueError:
+        epoch = to_epoch(value)
+    if not np.isfinite(epoch):
+        raise ValueError(f"{name} must be an ISO timestamp or epoch seconds, got '{value}'")
+    return epoch
+
+
+def _bbox_param(args):
+    """(min_lat, min_lon, max_lat, max_lon) query parameter, None when absent"""
+    value = args.get('bbox')
+    if value is None:
+        return None
+    try:
+        bbox = [float(v) for v in value.split(',')]
+    except ValueError:
+        bbox = []
+    if len(bbox) != 4 or not np.isfinite(bbox).all():
+        raise ValueError(f"bbox expects min_lat,min_lon,max_lat,max_lon, got '{value}'")
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise ValueError('bbox needs -90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180')
+    return bbox
+
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """
+    Bulk ingestion of speed observations as newline-delimited JSON
+    The body is parsed as it streams in (Content-Encoding: gzip supported) and
+    fed to the detector in slices of INGEST_SLICE_ROWS. Without a fit pool each
+    slice runs in a native thread (inline ARIMA fits would otherwise stall the
+    eventlet hub); with one, slices stay on the hub, because the pool's
+    futures are green and fits are already out of process. The stream worker
+    gets the detector between slices; malformed records are reported, not fatal
+    """
+    reader = NDJSONReader()
+    gzip = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+    step = Config.INGEST_SLICE_ROWS
+    batches = 0
+    detections = 0
+    start = time.perf_counter()
+    try:
+        for speed_batch in reader.batches(request.stream, gzip=gzip):
+            rows = np.arange(len(speed_batch))
+            for begin in range(0, len(speed_batch), step):
+                part = speed_batch.take(rows[begin:begin + step]) if len(speed_batch) > step else speed_batch
+                with detector_lock:
+                    if fit_executor is None:
+                        detection_results = tpool.execute(detector.process_batch, part)
+                    else:
+                        detection_results = detector.process_batch(part)
+                detections += update_registry(detection_results, part)
+                socketio.sleep(0)
+            batches += 1
+    except ValueError as e:
+        # Corrupt compressed body: batches before the error stay processed
+        return jsonify({'error': str(e), 'batches': batches, 'detections': detections,
+                        **reader.summary()}), 400
+    elapsed = time.perf_counter() - start
+    
     return jsonify({
-        'history': accident_history[-20:]  # Last 20 accidents
+        'batches': batches,
+        'detections': detections,
+        'elapsed_s': round(elapsed, 4),
+        'records_per_s': round(reader.accepted / elapsed) if elapsed else None,
+        **reader.summary()
     })
 
 
@@ -173,10 +373,11 @@ def clear_accident():
     result = simulator.clear_accident(car_id)
     
     # Synchronize detector state
-    if car_id:
-        detector.reset_car(car_id)
-    else:
-        detector.reset_all()
+    with detector_lock:
+        if car_id:
+            detector.reset_car(car_id)
+        else:
+            detector.reset_all()
         
     return jsonify(result)
 
@@ -186,6 +387,14 @@ def handle_connect():
     """Handle client connection"""
     print(f'Client connected: {request.sid}')
     emit('connection_response', {'status': 'connected'})
+    # New clients need the full state before they can apply deltas
+    delta_encoder.request_keyframe()
+
+
+@socketio.on('request_keyframe')
+def handle_request_keyframe():
+    """Client missed a delta and needs the full state"""
+    delta_encoder.request_keyframe()
 
 
 @socketio.on('disconnect')
@@ -201,6 +410,7 @@ def handle_start_simulation():
     
     if not simulation_running:
         simulation_running = True
+        delta_encoder.request_keyframe()
         # Start background worker thread
         thread = threading.Thread(target=data_stream_worker, daemon=True)
         thread.start()
@@ -213,6 +423,9 @@ def handle_stop_simulation():
     """Stop data simulation"""
     global simulation_running
     simulation_running = False
+    if snapshotter is not None:
+        with detector_lock:
+            snapshotter.save()
     emit('simulation_status', {'running': False})
     print('Simulation stopped')
 
@@ -226,7 +439,7 @@ def handle_update_config(data):
         Config.NOISE_LEVEL = float(data['noise_level'])
     if 'cusum_threshold' in data:
         Config.CUSUM_THRESHOLD = float(data['cusum_threshold'])
-        detector.cusum.threshold = Config.CUSUM_THRESHOLD
+        detector.bank.cusum_threshold = Config.CUSUM_THRESHOLD
     
     emit('config_updated', {'status': 'success'})
 
@@ -0,0 +1,3 @@
+"""
+Benchmarks package for Traffic Accident Detection System
+"""
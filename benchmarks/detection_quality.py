@@ -0,0 +1,172 @@
+"""
+Detection quality harness
+Runs seeded simulator scenarios on a VirtualClock through AccidentDetector and
+scores its accident state against the simulator's per-sample is_accident
+ground truth: detection delay, missed accidents, false alarms per car-hour
+and clearance delay, next to the detector's runtime. Detector changes made
+for speed should leave these numbers where they were
+
+Usage: python -m benchmarks.detection_quality [--cars 20] [--duration 3600] [--seeds 0 1 2]
+           [--predictors arima ewma]
+"""
+
+import argparse
+import json
+import time
+import warnings
+import numpy as np
+
+from config import Config
+from models.sequential_estimators import AccidentDetector, PREDICTORS
+from utils.clock import VirtualClock
+from utils.data_simulator import TrafficSimulator
+
+
+def score(labels, alarm, interval=None, grace=30.0):
+    """
+    Compare detector accident state against ground truth
+    labels, alarm: bool arrays [ticks, cars]; alarm is the detector's
+        accident_active flag (an alarm starts where it turns on)
+    interval: seconds per tick (default Config.UPDATE_INTERVAL)
+    grace: seconds after an accident ends during which new alarms are not false
+    Returns: dict of detection quality metrics (delays in seconds)
+    """
+    interval = interval or Config.UPDATE_INTERVAL
+    num_ticks, num_cars = labels.shape
+    grace_ticks = int(grace / interval)
+    delays = []
+    clearances = []
+    missed = 0
+    uncleared = 0
+    false_alarms = 0
+
+    for car in range(num_cars):
+        truth = labels[:, car]
+        on = alarm[:, car]
+        # Episode boundaries in ground truth
+        edges = np.diff(np.concatenate(([0], truth.astype(int), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        for start, end in zip(starts, ends):
+            hits = np.flatnonzero(on[start:end])
+            if not len(hits):
+                missed += 1
+                continue
+            delays.append(hits[0] * interval)
+            # Clearance: alarm still on after the accident ended (censored at the end of the run)
+            off = np.flatnonzero(~on[end:])
+            if len(off):
+                clearances.append(off[0] * interval)
+            else:
+                uncleared += 1
+        # Alarm onsets outside any accident episode (plus its grace period)
+        recent = np.convolve(truth, np.ones(grace_ticks + 1), mode='full')[:num_ticks] > 0
+        onsets = np.flatnonzero(np.diff(np.concatenate(([0], on.astype(int)))) == 1)
+        false_alarms += int(np.sum(~recent[onsets]))
+
+    car_hours = num_ticks * num_cars * interval / 3600.0
+    return {
+        'accidents': len(delays) + missed,
+        'detected': len(delays),
+        'missed': missed,
+        'mean_delay_s': _mean(delays),
+        'p50_delay_s': _percentile(delays, 50),
+        'p90_delay_s': _percentile(delays, 90),
+        'p99_delay_s': _percentile(delays, 99),
+        'false_alarms': false_alarms,
+        'false_alarms_per_car_hour': false_alarms / car_hours if car_hours else 0.0,
+        'mean_clearance_s': _mean(clearances),
+        'p90_clearance_s': _percentile(clearances, 90),
+        'uncleared': uncleared,
+    }
+
+
+def _mean(values):
+    return float(np.mean(values)) if values else None
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_labeled(num_cars, duration, seed=0, predictor=None, interval=None):
+    """
+    Simulate duration seconds of traffic and run the detector on every tick
+    Returns: (labels, alarm) bool arrays [ticks, cars] and detector seconds
+    """
+    interval = interval or Config.UPDATE_INTERVAL
+    clock = VirtualClock()
+    simulator = TrafficSimulator(num_cars, clock=clock, seed=seed)
+    # Inline ARIMA fits keep the run deterministic (see benchmarks.scenario)
+    detector = AccidentDetector(predictor=predictor, seed=seed)
+
+    num_ticks = int(duration / interval)
+    labels = np.zeros((num_ticks, num_cars), dtype=bool)
+    alarm = np.zeros((num_ticks, num_cars), dtype=bool)
+    elapsed = 0.0
+    for t in range(num_ticks):
+        batch = simulator.generate_speed_batch()
+        start = time.perf_counter()
+        results = detector.process_batch(batch)
+        elapsed += time.perf_counter() - start
+        labels[t] = batch.is_accident
+        alarm[t] = results.accident_active
+        clock.sleep(interval)
+    return labels, alarm, elapsed
+
+
+def evaluate(num_cars, duration, seeds=(0,), predictor=None, interval=None, grace=30.0):
+    """
+    Score one predictor over several seeded scenarios (cars of all seeds pooled)
+    Returns: score() dict plus runtime_s and us_per_sample
+    """
+    interval = interval or Config.UPDATE_INTERVAL
+    runs = [run_labeled(num_cars, duration, seed, predictor, interval) for seed in seeds]
+    labels = np.hstack([labels for labels, _, _ in runs])
+    alarm = np.hstack([alarm for _, alarm, _ in runs])
+    elapsed = sum(seconds for _, _, seconds in runs)
+
+    result = score(labels, alarm, interval, grace)
+    result['runtime_s'] = elapsed
+    result['us_per_sample'] = elapsed / labels.size * 1e6 if labels.size else None
+    return result
+
+
+def print_table(results):
+    """Print one row of score() + runtime per predictor name"""
+    print(f"{'predictor':<10}{'detected':>10}{'missed':>8}{'delay(s)':>10}{'p90(s)':>8}"
+          f"{'FA/car-h':>10}{'clear(s)':>10}{'us/sample':>11}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['detected']:>10}{r['missed']:>8}{_cell(r['mean_delay_s']):>10}"
+              f"{_cell(r['p90_delay_s']):>8}{r['false_alarms_per_car_hour']:>10.2f}"
+              f"{_cell(r['mean_clearance_s']):>10}{r['us_per_sample']:>11.1f}")
+
+
+def _cell(value):
+    return f"{value:.1f}" if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cars', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=3600.0, help='simulated seconds per seed')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--predictors', nargs='+', default=[Config.PREDICTOR], choices=sorted(PREDICTORS))
+    parser.add_argument('--grace', type=float, default=30.0, help='seconds after an accident before alarms count as false')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')  # statsmodels convergence chatter
+    results = {name: evaluate(args.cars, args.duration, args.seeds, name, grace=args.grace)
+               for name in args.predictors}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.cars} cars x {args.duration:.0f}s simulated, seeds {args.seeds}")
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
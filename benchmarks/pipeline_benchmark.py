@@ -0,0 +1,222 @@
+"""
+End-to-end pipeline benchmark
+Drives TrafficSimulator and AccidentDetector.process_speed tick by tick at a
+range of fleet sizes, on a VirtualClock with a fixed seed (no network, no
+sleeping). Per fleet size it reports tick latency percentiles, throughput,
+peak traced memory and the share of detector time spent in the predictor's
+predict(). Results are written as JSON so runs can be compared across commits
+
+Inline ARIMA refits cost tens of milliseconds per car, so each fleet size
+gets a time budget: it stops after the tick that exhausts the budget, and a
+size is skipped when the slowest tick of the previous size, scaled to the
+new fleet, would already exceed it
+
+Usage: python -m benchmarks.pipeline_benchmark [--sizes 2 100 10000] [--ticks 20]
+           [--budget 60] [--predictor arima] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+import numpy as np
+
+from config import Config
+from models.sequential_estimators import AccidentDetector, PREDICTORS
+from utils.clock import VirtualClock
+from utils.data_simulator import TrafficSimulator
+
+DEFAULT_SIZES = (2, 10, 100, 1000, 10000, 100000)
+DEFAULT_BUDGET = 60.0  # seconds of ticks per fleet size
+
+# Result fields reported as current / baseline ratios by --compare
+COMPARED = ('p50_tick_s', 'p99_tick_s', 'samples_per_s', 'peak_memory_mb')
+
+
+def run_size(num_cars, num_ticks, seed=0, predictor=None, memory=True, budget=None):
+    """
+    Run num_ticks ticks of num_cars cars through simulator and detector
+    memory: repeat the run under tracemalloc for peak memory (tracing slows
+        allocation-heavy code, so latencies come from the untraced run)
+    budget: stop after the tick that brings the total past this many seconds
+    Returns: dict of latency, throughput, memory and predict() share
+    """
+    predictor = predictor or Config.PREDICTOR
+    predictor_cls = PREDICTORS[predictor]
+    predict = predictor_cls.predict
+    predict_time = [0.0]
+
+    def timed_predict(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return predict(self, *args, **kwargs)
+        finally:
+            predict_time[0] += time.perf_counter() - start
+
+    # Wrapper cost lands in the predict share only, not in the totals it is compared to
+    predictor_cls.predict = timed_predict
+    try:
+        generate, detect = _run(num_cars, num_ticks, seed, predictor, budget)
+    finally:
+        predictor_cls.predict = predict
+
+    num_ticks = len(generate)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            _run(num_cars, num_ticks, seed, predictor)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    ticks = generate + detect
+    samples = num_cars * num_ticks
+    return {
+        'cars': num_cars,
+        'ticks': num_ticks,
+        'predictor': predictor,
+        'p50_tick_s': float(np.percentile(ticks, 50)),
+        'p90_tick_s': float(np.percentile(ticks, 90)),
+        'p99_tick_s': float(np.percentile(ticks, 99)),
+        'max_tick_s': float(ticks.max()),
+        'first_tick_s': float(ticks[0]),
+        'mean_generate_s': float(generate.mean()),
+        'mean_detect_s': float(detect.mean()),
+        'samples_per_s': samples / ticks.sum() if ticks.sum() else None,
+        'peak_memory_mb': peak / 2**20 if peak is not None else None,
+        'predict_s': predict_time[0],
+        'predict_share': predict_time[0] / detect.sum() if detect.sum() else None,
+    }
+
+
+def _run(num_cars, num_ticks, seed, predictor, budget=None):
+    """Returns: (generate seconds per tick, detect seconds per tick) arrays, one entry per tick run"""
+    clock = VirtualClock()
+    simulator = TrafficSimulator(num_cars, clock=clock, seed=seed)
+    # Inline ARIMA fits, as in benchmarks.scenario, so fit cost is part of the tick
+    detector = AccidentDetector(predictor=predictor, seed=seed)
+    generate = np.zeros(num_ticks)
+    detect = np.zeros(num_ticks)
+
+    for t in range(num_ticks):
+        start = time.perf_counter()
+        speed_data = simulator.generate_speed_data()
+        generated = time.perf_counter()
+        detector.process_speed(speed_data)
+        generate[t] = generated - start
+        detect[t] = time.perf_counter() - generated
+        clock.sleep(Config.UPDATE_INTERVAL)
+        if budget is not None and generate.sum() + detect.sum() > budget:
+            return generate[:t + 1], detect[:t + 1]
+    return generate, detect
+
+
+def environment():
+    """Commit and platform details stored next to the results"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+    }
+
+
+def compare(results, baseline):
+    """
+    Ratios of current to baseline values per fleet size
+    Returns: {cars: {field: ratio}} for sizes present in both runs
+    """
+    previous = {r['cars']: r for r in baseline['results']}
+    ratios = {}
+    for r in results:
+        old = previous.get(r['cars'])
+        if old is None:
+            continue
+        ratios[r['cars']] = {field: r[field] / old[field]
+                             for field in COMPARED if r.get(field) and old.get(field)}
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='fleet sizes')
+    parser.add_argument('--ticks', type=int, default=20, help='ticks per fleet size')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='seconds per fleet size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--predictor', default=None, choices=sorted(PREDICTORS))
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', default=None, help='write results JSON to this file')
+    parser.add_argument('--compare', default=None, help='results JSON of an earlier run')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')  # statsmodels convergence chatter
+    results = []
+    skipped = []
+    for size in sorted(args.sizes):
+        if results:
+            previous = results[-1]
+            projected = previous['max_tick_s'] * size / previous['cars']
+            if projected > args.budget:
+                skipped.append({'cars': size, 'projected_tick_s': projected})
+                continue
+        results.append(run_size(size, args.ticks, args.seed, args.predictor, not args.no_memory, args.budget))
+        if not args.json:
+            _print_row(results[-1], header=len(results) == 1)
+
+    report = {
+        'benchmark': 'pipeline',
+        'seed': args.seed,
+        'interval_s': Config.UPDATE_INTERVAL,
+        'budget_s': args.budget,
+        'environment': environment(),
+        'results': results,
+        'skipped': skipped,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report['baseline_commit'] = baseline.get('environment', {}).get('commit')
+        report['ratios'] = compare(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for s in skipped:
+        print(f"{s['cars']:>8}  skipped: projected {s['projected_tick_s']:.0f}s per tick exceeds the budget")
+    if args.compare:
+        print(f"\nvs {args.compare} (commit {report['baseline_commit'] or '?'}), current / baseline:")
+        print(f"{'cars':>8}" + ''.join(f"{field:>16}" for field in COMPARED))
+        for cars, ratio in report['ratios'].items():
+            print(f"{cars:>8}" + ''.join(f"{ratio[field]:>16.2f}" if field in ratio else f"{'-':>16}"
+                                         for field in COMPARED))
+
+
+def _print_row(r, header=False):
+    if header:
+        print(f"predictor {r['predictor']}")
+        print(f"{'cars':>8}{'ticks':>7}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'samples/s':>12}"
+              f"{'peak(MB)':>10}{'predict%':>10}")
+    peak = f"{r['peak_memory_mb']:.1f}" if r['peak_memory_mb'] is not None else '-'
+    share = f"{100 * r['predict_share']:.1f}" if r['predict_share'] is not None else '-'
+    print(f"{r['cars']:>8}{r['ticks']:>7}{1e3 * r['p50_tick_s']:>10.2f}{1e3 * r['p90_tick_s']:>10.2f}"
+          f"{1e3 * r['p99_tick_s']:>10.2f}{r['samples_per_s'] or 0:>12.0f}{peak:>10}{share:>10}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Predictor comparison benchmark
+Runs the same seeded simulator scenarios through AccidentDetector once per
+predictor and reports detection delay, false alarm rate and runtime against
+the simulator's ground truth (benchmarks.detection_quality does the running
+and scoring; this is its all-predictors view in ticks)
+
+Usage: python -m benchmarks.predictor_comparison [--cars 20] [--ticks 600] [--seeds 0]
+"""
+
+import argparse
+import json
+import warnings
+
+from config import Config
+from benchmarks.detection_quality import evaluate, print_table
+from models.sequential_estimators import PREDICTORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cars', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=600, help='ticks of Config.UPDATE_INTERVAL per seed')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--predictors', nargs='+', default=list(PREDICTORS), choices=sorted(PREDICTORS))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')  # statsmodels convergence chatter
+    duration = args.ticks * Config.UPDATE_INTERVAL
+    results = {name: evaluate(args.cars, duration, args.seeds, name) for name in args.predictors}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.cars} cars x {args.ticks} ticks, seeds {args.seeds}")
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Parallel detector threshold tuner
+Replays a seeded simulated stream once, recording speeds, predictor
+forecasts and is_accident ground truth per car and tick. The recorded arrays
+go into shared memory, and worker processes score parameter combinations
+for the CUSUM, SPRT and Page-Hinkley tests against them. Thresholds do not
+feed back into the predictors, so each combination only re-runs the
+vectorized DetectorBank over the recording. Prints the Pareto front of mean
+detection delay vs false alarms per car-hour
+
+Usage: python -m benchmarks.threshold_tuner [--cars 20] [--duration 3600] [--seed 0]
+           [--grid cusum_threshold=5,10,20 ph_delta=1,2] [--samples 200] [--workers 4]
+           [--save stream.npz | --load stream.npz] [--output tuning.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import multiprocessing
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from benchmarks.detection_quality import score
+from config import Config
+from models.sequential_estimators import DetectorBank, make_predictor
+from utils.clock import VirtualClock
+from utils.data_simulator import TrafficSimulator
+
+# Tuned parameters: DetectorBank keyword -> (Config attribute, default grid)
+# SPRT_THRESHOLD_LOWER is left out: the fleet detector only alerts on the upper threshold
+PARAMETERS = {
+    'cusum_threshold': ('CUSUM_THRESHOLD', (5.0, 10.0, 15.0, 20.0)),
+    'cusum_drift': ('CUSUM_DRIFT', (1.0, 2.0, 3.0)),
+    'sprt_threshold_upper': ('SPRT_THRESHOLD_UPPER', (2.5, 5.0, 10.0)),
+    'ph_threshold': ('PAGE_HINKLEY_THRESHOLD', (4.0, 8.0, 16.0)),
+    'ph_delta': ('PAGE_HINKLEY_DELTA', (1.0, 2.0, 3.0)),
+}
+
+# Thresholds must be positive; drift and delta may be zero
+POSITIVE = ('cusum_threshold', 'sprt_threshold_upper', 'ph_threshold')
+
+# Recorded arrays [ticks, cars] shared with the workers
+STREAM_FIELDS = ('speed', 'predicted', 'labels')
+
+
+def record_stream(num_cars, duration, seed=0, predictor=None, interval=None):
+    """
+    Simulate duration seconds of traffic and run each car's predictor as
+    AccidentDetector does (update, then predict with inline refits)
+    Returns: dict of float arrays [ticks, cars]: speed, predicted, labels
+    """
+    interval = interval or Config.UPDATE_INTERVAL
+    clock = VirtualClock()
+    simulator = TrafficSimulator(num_cars, clock=clock, seed=seed)
+    predictors = [make_predictor(predictor) for _ in range(num_cars)]
+
+    num_ticks = int(duration / interval)
+    stream = {field: np.zeros((num_ticks, num_cars)) for field in STREAM_FIELDS}
+    for t in range(num_ticks):
+        batch = simulator.generate_speed_batch()
+        for model, speed in zip(predictors, batch.speed.tolist()):
+            model.update(speed)
+        stream['speed'][t] = batch.speed
+        stream['predicted'][t] = [model.predict() for model in predictors]
+        stream['labels'][t] = batch.is_accident
+        clock.sleep(interval)
+    return stream
+
+
+def replay(stream, params):
+    """
+    Run AccidentDetector's voting and accident state over a recorded stream
+    with DetectorBank(**params)
+    Returns: bool array [ticks, cars] of accident_active
+    """
+    speed, predicted = stream['speed'], stream['predicted']
+    num_ticks, num_cars = speed.shape
+    bank = DetectorBank(capacity=num_cars, **params)
+    bank.size = num_cars
+    rows = np.arange(num_cars)
+
+    # AccidentDetector's clearing rule: mean of the last Config.CLEAR_WINDOW speeds per car
+    # (defined once that many have arrived) above Config.CLEAR_SPEED
+    clear_window = Config.CLEAR_WINDOW
+    window = np.cumsum(speed, axis=0)
+    recent = np.full_like(speed, -np.inf)
+    recent[clear_window - 1:] = window[clear_window - 1:]
+    recent[clear_window:] -= window[:-clear_window]
+    recent /= clear_window
+
+    active = np.zeros(num_cars, dtype=bool)
+    alarm = np.zeros((num_ticks, num_cars), dtype=bool)
+    for t in range(num_ticks):
+        _, cusum_alert, _, sprt_alert, _, ph_alert = bank.update(rows, speed[t], predicted[t])
+        votes = cusum_alert.astype(int) + sprt_alert + ph_alert
+        detected = votes >= Config.REQUIRE_VOTES
+        if t + 1 < Config.MIN_SAMPLES_FOR_DETECTION:
+            detected[:] = False
+        cleared = active & ~detected & (recent[t] > Config.CLEAR_SPEED)
+        if cleared.any():
+            bank.reset(np.flatnonzero(cleared))
+        active = (active | detected) & ~cleared
+        alarm[t] = active
+    return alarm
+
+
+def evaluate(stream, params, interval=None):
+    """Score one parameter combination: score() metrics plus the parameters"""
+    result = score(stream['labels'].astype(bool), replay(stream, params), interval)
+    result['params'] = params
+    return result
+
+
+def parameter_grid(grid):
+    """All combinations of {name: values} as a list of dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def random_samples(grid, count, seed=0):
+    """
+    count combinations drawn uniformly between the smallest and largest value
+    of each parameter in grid (seeded)
+    """
+    rng = np.random.default_rng(seed)
+    bounds = {name: (min(values), max(values)) for name, values in grid.items()}
+    return [{name: round(float(rng.uniform(low, high)), 3) for name, (low, high) in bounds.items()}
+            for _ in range(count)]
+
+
+def pareto_front(results):
+    """
+    Results not dominated in (mean_delay_s, false_alarms_per_car_hour), both
+    minimized; combinations that detect nothing are left out
+    Returns: front sorted by mean delay
+    """
+    scored = sorted((r for r in results if r['mean_delay_s'] is not None),
+                    key=lambda r: (r['mean_delay_s'], r['false_alarms_per_car_hour'], r['missed']))
+    front = []
+    best_false_alarms = float('inf')
+    for r in scored:
+        if r['false_alarms_per_car_hour'] < best_false_alarms:
+            front.append(r)
+            best_false_alarms = r['false_alarms_per_car_hour']
+    return front
+
+
+class SharedStream:
+    """
+    Recorded stream arrays in one shared memory block
+    The creating process owns the block (close() unlinks it); workers attach
+    by name with SharedStream.attach(spec)
+    """
+    def __init__(self, stream=None, spec=None):
+        if spec is None:
+            shape = stream['speed'].shape
+            size = len(STREAM_FIELDS) * int(np.prod(shape)) * 8
+            self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self.owner = True
+            self.spec = {'name': self.memory.name, 'shape': shape}
+        else:
+            self.memory = shared_memory.SharedMemory(name=spec['name'])
+            self.owner = False
+            self.spec = spec
+        shape = tuple(self.spec['shape'])
+        block = np.ndarray((len(STREAM_FIELDS),) + shape, dtype=float, buffer=self.memory.buf)
+        self.arrays = {field: block[i] for i, field in enumerate(STREAM_FIELDS)}
+        if stream is not None:
+            for field in STREAM_FIELDS:
+                self.arrays[field][...] = stream[field]
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec=spec)
+
+    def close(self):
+        self.arrays = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# Per-worker view of the shared stream (set by _init_worker)
+_worker_stream = None
+
+
+def _init_worker(spec):
+    global _worker_stream
+    _worker_stream = SharedStream.attach(spec)
+
+
+def _evaluate_chunk(combos, interval):
+    return [evaluate(_worker_stream.arrays, params, interval) for params in combos]
+
+
+def search(stream, combos, workers=None, interval=None, chunk_size=8):
+    """
+    Evaluate every parameter combination, in worker processes when workers > 1
+    Returns: list of evaluate() results in combination order
+    """
+    workers = workers or os.cpu_count()
+    if workers <= 1:
+        return [evaluate(stream, params, interval) for params in combos]
+
+    shared = SharedStream(stream)
+    try:
+        # Spawned workers do not inherit eventlet's monkey-patched state (as ARIMAFitExecutor)
+        context = multiprocessing.get_context('spawn')
+        chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(shared.spec,)) as pool:
+            results = pool.map(_evaluate_chunk, chunks, [interval] * len(chunks))
+            return [r for chunk in results for r in chunk]
+    finally:
+        shared.close()
+
+
+def _parse_grid(items):
+    grid = {name: values for name, (_, values) in PARAMETERS.items()}
+    for item in items or ():
+        name, _, values = item.partition('=')
+        if name not in PARAMETERS or not values:
+            raise SystemExit(f"--grid expects name=v1,v2,... with name one of {list(PARAMETERS)}")
+        try:
+            grid[name] = tuple(float(v) for v in values.split(','))
+        except ValueError:
+            raise SystemExit(f"--grid {name}: values must be numbers, got '{values}'")
+        bad = [v for v in grid[name] if not np.isfinite(v) or v < 0 or (v == 0 and name in POSITIVE)]
+        if bad:
+            limit = 'positive' if name in POSITIVE else 'non-negative'
+            raise SystemExit(f"--grid {name}: values must be {limit}, got {bad}")
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cars', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=3600.0, help='simulated seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--predictor', default=None)
+    parser.add_argument('--grid', nargs='+', default=None, metavar='NAME=V1,V2',
+                        help='values per parameter (default grid for the rest)')
+    parser.add_argument('--samples', type=int, default=None,
+                        help='random search: this many combinations within each grid range')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--save', default=None, help='write the recorded stream to this .npz')
+    parser.add_argument('--load', default=None, help='tune on a stream written by --save')
+    parser.add_argument('--output', default=None, help='write all results and the front as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')  # statsmodels convergence chatter
+    start = time.perf_counter()
+    if args.load:
+        with np.load(args.load) as data:
+            stream = {field: data[field] for field in STREAM_FIELDS}
+    else:
+        stream = record_stream(args.cars, args.duration, args.seed, args.predictor)
+    if args.save:
+        np.savez_compressed(args.save, **stream)
+    recorded = time.perf_counter()
+
+    grid = _parse_grid(args.grid)
+    combos = random_samples(grid, args.samples, args.seed) if args.samples else parameter_grid(grid)
+    results = search(stream, combos, args.workers)
+    front = pareto_front(results)
+    searched = time.perf_counter()
+
+    num_ticks, num_cars = stream['speed'].shape
+    print(f"{num_cars} cars x {num_ticks} ticks recorded in {recorded - start:.1f}s, "
+          f"{len(combos)} combinations scored in {searched - recorded:.1f}s")
+    defaults = {name: getattr(Config, attr) for name, (attr, _) in PARAMETERS.items()}
+    current = evaluate(stream, defaults)
+    print(f"config.py: delay {current['mean_delay_s'] or 0:.1f}s, "
+          f"{current['false_alarms_per_car_hour']:.2f} FA/car-h, missed {current['missed']}")
+    print(f"\nPareto front ({len(front)} of {len(results)}):")
+    print(f"{'delay(s)':>9}{'FA/car-h':>10}{'missed':>8}  parameters")
+    for r in front:
+        params = ' '.join(f"{PARAMETERS[name][0]}={value:g}" for name, value in r['params'].items())
+        print(f"{r['mean_delay_s']:>9.1f}{r['false_alarms_per_car_hour']:>10.2f}{r['missed']:>8}  {params}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cars': num_cars, 'ticks': num_ticks, 'seed': args.seed,
+                       'config': current, 'front': front, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,10 @@ class Config:
     NUM_CARS = 2   # Number of simulated cars
     NOISE_LEVEL = 5.0  # GPS noise in mph
     ACCIDENT_PROBABILITY = 0.03  # Probability of accident per interval (3% = ~1 accident per 67 seconds)
+    CLOCK = os.environ.get('CLOCK', 'system')  # 'system' = real time, 'virtual' = fast-forward (no real sleeping)
+    VIRTUAL_CLOCK_START = os.environ.get('VIRTUAL_CLOCK_START', '2024-01-01T12:00:00')
+    RANDOM_SEED = int(os.environ['RANDOM_SEED']) if os.environ.get('RANDOM_SEED') else None  # None = unseeded
+    TICK_OVERRUN_POLICY = os.environ.get('TICK_OVERRUN_POLICY', 'skip')  # late ticks: 'skip' missed deadlines or 'coalesce' them into one
     
     # Traffic parameters
     NORMAL_SPEED_MEAN = 60.0  # mph
@@ -31,11 +35,95 @@ class Config:
     SPRT_THRESHOLD_LOWER = 0.2
     PAGE_HINKLEY_THRESHOLD = 8.0
     PAGE_HINKLEY_DELTA = 2.0
+    CLEAR_WINDOW = 5  # recent speeds averaged when deciding whether an accident has cleared
+    CLEAR_SPEED = 40.0  # mph; an accident clears once that mean exceeds this and the tests stop agreeing
+    
+    # Speed predictor: 'arima', 'ewma', 'holt' or 'rls_ar'
+    PREDICTOR = os.environ.get('PREDICTOR', 'arima')
+    EWMA_ALPHA = 0.3
+    HOLT_ALPHA = 0.3
+    HOLT_BETA = 0.1
+    RLS_AR_ORDER = 2
+    RLS_FORGETTING = 0.98
+    RLS_INITIAL_COV = 1000.0  # initial coefficient covariance scale; its trace is capped at the initial value
+    
+    # ARIMA refit schedule
+    ARIMA_REFIT_INTERVAL = 30  # samples between parameter re-estimation
+    ARIMA_DRIFT_THRESHOLD = 4.0  # refit early when mean squared standardized residual exceeds this
+    ARIMA_MAX_ITER = 10  # optimizer iteration cap for warm-started fits
+    ARIMA_WINDOW_CHANGE_TOL = 0.2  # skip scheduled refits while window mean/std move less than this (in stds)
+    ARIMA_FIT_WORKERS = int(os.environ.get('ARIMA_FIT_WORKERS', 0))  # 0 = fit inline, >0 = process pool size
+    ARIMA_FIT_DEADLINE = 0.5  # seconds per tick to wait for pool fits before using last good forecast
     
     # Data buffer settings
     BUFFER_SIZE = 300  # seconds of history to keep
     MIN_SAMPLES_FOR_DETECTION = 10  # minimum samples before detection (20 seconds warm-up)
     
+    # Offline log analysis (utils/log_replay.py, utils/log_parser.py, utils/travel_times.py)
+    SEGMENT_ENTRY = 'PointA'
+    SEGMENT_EXIT = 'PointB'
+    REPLAY_SEGMENT_LENGTH = 10.0  # miles from PointA to PointB: a TRAVEL_TIME_H0_MEAN trip reads as NORMAL_SPEED_MEAN
+    REPLAY_TICK = 60.0  # seconds of log grouped into one observation per segment (or car)
+    REPLAY_BATCH_SIZE = 1024  # observations per detector batch
+    REPLAY_MAX_DELAY = 3600.0  # seconds an out-of-order log line may lag behind newer lines
+    TRAVEL_JOIN_MAX_PENDING = 100000  # cars held between entry and exit before the oldest is dropped
+    TRAVEL_JOIN_TIMEOUT = 3600.0  # seconds before an entry without an exit is dropped
+    LOG_CACHE_DIR = os.environ.get('LOG_CACHE_DIR', '.log_cache')  # columnar caches from utils/log_parser.py
+    
+    # Interval hypothesis tests (models/interval_tests.py)
+    INTERVAL_WIDTH = 600.0  # seconds per window
+    INTERVAL_ALPHA = 0.1  # significance level
+    REPORT_RATE_H0 = 0.01  # share of cars filing a report in normal traffic
+    TRAVEL_TIME_H0_MEAN = 10.0  # minutes, normal traffic
+    TRAVEL_TIME_H0_STD = 1.0
+    TRAVEL_TIME_H1_MEAN = 20.0  # minutes, accident
+    TRAVEL_TIME_H1_STD = 5.0 ** 0.5
+    
+    # Online segment travel-time detection (models/segment_detector.py)
+    # Travel times are scaled to the segment baseline on the TRAVEL_TIME_H0_MEAN scale
+    SEGMENT_CUSUM_THRESHOLD = 25.0  # minutes of accumulated excess travel time
+    SEGMENT_CUSUM_DRIFT = 2.0  # minutes of excess per trip that are ignored
+    SEGMENT_SPRT_THRESHOLD_UPPER = 5.0  # log-likelihood ratio deciding 'accident'
+    SEGMENT_SPRT_THRESHOLD_LOWER = -5.0  # log-likelihood ratio deciding 'normal' (the test restarts)
+    SEGMENT_BASELINE_ALPHA = 0.05  # EWMA weight of each normal trip in the segment baseline
+    SEGMENT_STATS_ALPHA = 0.1  # EWMA weight of each trip in the current travel-time mean/std
+    SEGMENT_MIN_TRIPS = 5  # trips on a segment before detection
+    SEGMENT_REQUIRE_VOTES = 2  # out of 2 tests (CUSUM, SPRT) must agree
+    SEGMENT_CLEAR_TRIPS = 5  # trips after an onset before the current mean can clear it
+    
+    # Per-stage timing histograms and GET /metrics (utils/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # Bulk NDJSON ingestion (POST /api/ingest, utils/ndjson_ingest.py)
+    INGEST_BATCH_SIZE = 5000  # records parsed per batch
+    INGEST_SLICE_ROWS = 256  # records per detector step; other greenlets run between steps
+    INGEST_CHUNK_SIZE = 64 * 1024  # bytes read (and inflated) per step
+    INGEST_MAX_LINE_BYTES = 64 * 1024  # longer lines are rejected without being buffered
+    INGEST_MAX_REJECTS_REPORTED = 100  # rejected records listed in the response (all are counted)
+    
+    # Detector state snapshots (utils/snapshot.py)
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', 'detector_snapshot.npz')  # '' = no snapshots
+    SNAPSHOT_INTERVAL = 60.0  # seconds between snapshots
+    SNAPSHOT_TICK_BUDGET = 0.02  # seconds per tick spent copying state out of the detector
+    SNAPSHOT_MAX_AGE = 900.0  # older snapshots are not restored at startup
+    SNAPSHOT_HISTORY_SAMPLES = 20  # speed history samples saved per car (detection needs MIN_SAMPLES_FOR_DETECTION)
+    
+    # Accident history store (utils/accident_history.py, GET /api/history)
+    HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', 'accident_history.db')  # SQLite file (WAL mode)
+    HISTORY_CACHE_SIZE = 1000  # newest accidents also kept in memory
+    HISTORY_PAGE_SIZE = 20  # default entries per /api/history page
+    HISTORY_MAX_PAGE = 500  # largest page a request may ask for
+    
+    # traffic_update delta encoding
+    DELTA_KEYFRAME_INTERVAL = 15  # ticks between full-state keyframes
+    DELTA_THRESHOLDS = {  # numeric car fields are resent only when they move more than this
+        'speed': 0.5,
+        'predicted_speed': 0.5,
+        'cusum_stat': 0.5,
+        'sprt_ratio': 0.5,
+        'ph_stat': 0.5
+    }
+    
     # Detection confidence
     MIN_CONFIDENCE = 0.7
     REQUIRE_VOTES = 2  # out of 3 tests must agree
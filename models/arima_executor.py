@@ -0,0 +1,88 @@
+"""
+Parallel ARIMA fitting for Traffic Accident Detection System
+Farms per-car parameter re-estimation out to a process pool
+"""
+
+import atexit
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from config import Config
+from models.sequential_estimators import fit_arima_params
+
+
+class ARIMAFitExecutor:
+    """
+    Runs ARIMAPredictor refits in worker processes
+    Fits are submitted during a tick and installed when they finish;
+    predictors keep forecasting with their last good parameters meanwhile
+    """
+    def __init__(self, workers=None, deadline=None):
+        self.workers = workers or Config.ARIMA_FIT_WORKERS or os.cpu_count()
+        self.deadline = deadline if deadline is not None else Config.ARIMA_FIT_DEADLINE
+        # Spawned workers do not inherit eventlet's monkey-patched state
+        context = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        # Under eventlet the pool's own exit hook never runs and interpreter exit
+        # hangs on the live workers, so shut the pool down explicitly
+        atexit.register(self.shutdown)
+        self.pending = {}  # future -> (predictor, samples_seen at submit)
+        self.completed = 0
+        self.failed = 0
+        
+    def submit(self, predictor):
+        """Queue a refit of the predictor's current window"""
+        if predictor.fit_pending:
+            return
+        predictor.fit_pending = True
+        future = self.pool.submit(fit_arima_params, list(predictor.history),
+                                  predictor.order, predictor.params)
+        self.pending[future] = (predictor, predictor.samples_seen)
+        
+    def collect(self, deadline=None):
+        """
+        Install finished fits, waiting until `deadline` (time.monotonic()) at most
+        Returns: number of fits installed
+        """
+        if not self.pending:
+            return 0
+        timeout = 0 if deadline is None else max(0.0, deadline - time.monotonic())
+        done, _ = wait(list(self.pending), timeout=timeout)
+        
+        installed = 0
+        for future in done:
+            predictor, seen = self.pending.pop(future)
+            predictor.fit_pending = False
+            try:
+                fit = future.result()
+            except Exception:
+                # Keep the previous parameters and the drift state that asked for the
+                # fit; needs_refit() decides when to retry
+                self.failed += 1
+                continue
+            
+            # Replay observations that arrived while the fit was running
+            missed = min(predictor.samples_seen - seen, len(predictor.history))
+            replay = list(predictor.history)[len(predictor.history) - missed:] if missed else ()
+            predictor.install(fit, replay)
+            self.completed += 1
+            installed += 1
+        return installed
+    
+    def get_status(self):
+        """Get executor status summary"""
+        return {
+            'workers': self.workers,
+            'pending': len(self.pending),
+            'completed': self.completed,
+            'failed': self.failed
+        }
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        for predictor, _ in self.pending.values():
+            predictor.fit_pending = False
+        self.pending.clear()
+        # Queued fits are cancelled; waiting covers at most the fits already running
+        self.pool.shutdown(wait=True, cancel_futures=True)
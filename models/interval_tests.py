@@ -0,0 +1,129 @@
+"""
+Interval hypothesis tests over checkpoint passages
+Vectorized forms of the lab notebook's per-interval tests: the share of cars
+filing reports (binomial tail test) and segment travel times (z test and
+likelihood ratio test). Events are sorted once; every window's counts and
+sums come from prefix sums indexed with np.searchsorted, so overlapping
+(sliding) windows cost no more than fixed ones
+"""
+
+import numpy as np
+from scipy.stats import binom, chi2, norm
+
+from config import Config
+
+
+def window_edges(times, width=None, step=None, start=None, end=None):
+    """
+    Window start/end times covering times
+    width: window length in seconds (default Config.INTERVAL_WIDTH)
+    step: distance between window starts (default width, i.e. fixed
+        non-overlapping windows; smaller values give sliding windows)
+    Returns: (starts, ends) arrays
+    """
+    width = width or Config.INTERVAL_WIDTH
+    step = step or width
+    times = np.asarray(times, dtype=float)
+    if not len(times) and (start is None or end is None):
+        return np.array([]), np.array([])
+    start = times.min() if start is None else start
+    end = times.max() if end is None else end
+    starts = start + step * np.arange(max(int(np.ceil((end - start) / step)), 1))
+    return starts, starts + width
+
+
+def _window_sums(times, values, starts, ends):
+    """
+    Count and sum of values for each window [starts[i], ends[i])
+    values: list of arrays aligned with times
+    """
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    lo = np.searchsorted(times, starts, side='left')
+    hi = np.searchsorted(times, ends, side='left')
+    sums = []
+    for v in values:
+        prefix = np.concatenate(([0.0], np.cumsum(v[order], dtype=float)))
+        sums.append(prefix[hi] - prefix[lo])
+    return hi - lo, sums
+
+
+def binomial_interval_test(times, reported, width=None, step=None, alpha=None, p0=None,
+                           start=None, end=None):
+    """
+    Per-window test of H0: each car reports an accident with probability p0
+    times: passage times in seconds (the notebook bins by PointA entry)
+    reported: bool per passage, whether that car filed a report
+    Returns: dict of per-window arrays (start, end, n, reports, proportion,
+        pvalue, reject)
+    """
+    alpha = alpha or Config.INTERVAL_ALPHA
+    p0 = p0 or Config.REPORT_RATE_H0
+    times = np.asarray(times, dtype=float)
+    reported = np.asarray(reported, dtype=bool)
+    starts, ends = window_edges(times, width, step, start, end)
+    n, (reports,) = _window_sums(times, [reported], starts, ends)
+    reports = reports.astype(np.int64)
+
+    # P(R >= r) under Binomial(n, p0); empty windows get p = 1
+    pvalue = np.where(n > 0, binom.sf(reports - 1, n, p0), 1.0)
+    return {
+        'start': starts,
+        'end': ends,
+        'n': n,
+        'reports': reports,
+        'proportion': np.divide(reports, n, out=np.zeros(len(n)), where=n > 0),
+        'pvalue': pvalue,
+        'reject': pvalue < alpha,
+    }
+
+
+def travel_time_interval_test(times, durations, width=None, step=None, alpha=None,
+                              h0=None, h1=None, start=None, end=None):
+    """
+    Per-window tests of travel times (minutes) against normal traffic
+    times: passage times in seconds (the notebook bins by PointB exit)
+    h0, h1: (mean, std) of travel time in normal traffic / with an accident
+    z test: one-sided test of the window mean against h0
+    Likelihood ratio test: LRT = -2 (log L0 - log L1), p = chi2.sf(LRT, 1)
+        as in the notebook
+    Returns: dict of per-window arrays (start, end, n, mean, z, z_pvalue,
+        lrt, pvalue, reject)
+    """
+    alpha = alpha or Config.INTERVAL_ALPHA
+    mu0, sigma0 = h0 or (Config.TRAVEL_TIME_H0_MEAN, Config.TRAVEL_TIME_H0_STD)
+    mu1, sigma1 = h1 or (Config.TRAVEL_TIME_H1_MEAN, Config.TRAVEL_TIME_H1_STD)
+    times = np.asarray(times, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    starts, ends = window_edges(times, width, step, start, end)
+
+    # Per-passage log-likelihood ratio, summed per window like the durations
+    llr = norm.logpdf(durations, mu1, sigma1) - norm.logpdf(durations, mu0, sigma0)
+    n, (total, llr_sum) = _window_sums(times, [durations, llr], starts, ends)
+
+    has_data = n > 0
+    mean = np.divide(total, n, out=np.zeros(len(n)), where=has_data)
+    z = np.divide((mean - mu0) * np.sqrt(n), sigma0, out=np.zeros(len(n)), where=has_data)
+    lrt = 2.0 * llr_sum
+    pvalue = np.where(has_data, chi2.sf(lrt, df=1), 1.0)
+    return {
+        'start': starts,
+        'end': ends,
+        'n': n,
+        'mean': mean,
+        'z': z,
+        'z_pvalue': np.where(has_data, norm.sf(z), 1.0),
+        'lrt': lrt,
+        'pvalue': pvalue,
+        'reject': pvalue < alpha,
+    }
+
+
+def report_test(trips, **kwargs):
+    """binomial_interval_test over TravelTimes binned by entry time (needs mark_reported())"""
+    return binomial_interval_test(trips.entry, trips.reported, **kwargs)
+
+
+def travel_time_test(trips, **kwargs):
+    """travel_time_interval_test over TravelTimes binned by exit time"""
+    return travel_time_interval_test(trips.exit, trips.duration / 60.0, **kwargs)
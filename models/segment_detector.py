@@ -0,0 +1,191 @@
+"""
+Online travel-time change detection per road segment
+Checkpoint passages (PointA, PointB, ...) are joined per car into segment
+trips as they arrive. Each completed trip updates its segment's travel-time
+statistics and that segment's own CUSUMDetector and SPRTDetector. All state
+is a handful of scalars per segment, so every passage costs O(1) however
+many segments are live
+"""
+
+import numpy as np
+
+from config import Config
+from models.sequential_estimators import CUSUMDetector, SPRTDetector
+from utils.travel_times import CheckpointJoin
+
+
+class SegmentState:
+    """
+    Travel-time statistics and detectors for one segment (times in minutes)
+    baseline: typical travel time; the mean of the first trips, then an EWMA
+        over trips while no accident is active
+    mean, std: EWMA travel time over all trips (current conditions)
+    """
+    def __init__(self, segment, cusum, sprt, baseline=None):
+        self.segment = segment
+        self.cusum = cusum
+        self.sprt = sprt
+        self.baseline = baseline
+        self.learn_baseline = baseline is None
+        self.mean = None
+        self.var = 0.0
+        self.trips = 0
+        self.last_exit = None
+
+        self.accident_active = False
+        self.accident_start_time = None
+        self.accident_id = None
+        self.accident_trips = 0
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+    def reset_detectors(self):
+        self.cusum.reset()
+        self.sprt.reset()
+
+
+class SegmentDetector:
+    """
+    Streaming travel-time detector over a network of checkpoints
+    Travel times are scaled to each segment's baseline on the scale of
+    Config.TRAVEL_TIME_H0_MEAN, so one set of thresholds and SPRT hypotheses
+    (the notebook's normal vs accident travel times) serves segments of any
+    length
+    segments: iterable of (entry, exit) checkpoint pairs to monitor (default:
+        the configured SEGMENT_ENTRY -> SEGMENT_EXIT segment only, so return
+        trips are not monitored), or 'all' for every consecutive pair seen
+    baselines: optional dict "entry-exit" -> known travel time in minutes;
+        the configured PointA -> PointB segment defaults to TRAVEL_TIME_H0_MEAN
+    """
+    def __init__(self, segments=None, baselines=None, join=None, seed=None,
+                 cusum_threshold=None, cusum_drift=None,
+                 sprt_threshold_upper=None, sprt_threshold_lower=None):
+        if segments is None:
+            segments = [(Config.SEGMENT_ENTRY, Config.SEGMENT_EXIT)]
+        self.segments = None if segments == 'all' else set(segments)
+        self.baselines = {f"{Config.SEGMENT_ENTRY}-{Config.SEGMENT_EXIT}": Config.TRAVEL_TIME_H0_MEAN}
+        self.baselines.update(baselines or {})
+        self.join = join if join is not None else CheckpointJoin()
+        self.rng = np.random.default_rng(seed if seed is not None else Config.RANDOM_SEED)
+
+        self.cusum_threshold = cusum_threshold or Config.SEGMENT_CUSUM_THRESHOLD
+        self.cusum_drift = cusum_drift or Config.SEGMENT_CUSUM_DRIFT
+        self.sprt_threshold_upper = sprt_threshold_upper or Config.SEGMENT_SPRT_THRESHOLD_UPPER
+        self.sprt_threshold_lower = sprt_threshold_lower or Config.SEGMENT_SPRT_THRESHOLD_LOWER
+        self.reference = Config.TRAVEL_TIME_H0_MEAN
+        self.h0 = (Config.TRAVEL_TIME_H0_MEAN, Config.TRAVEL_TIME_H0_STD)
+        self.h1 = (Config.TRAVEL_TIME_H1_MEAN, Config.TRAVEL_TIME_H1_STD)
+
+        # Dictionary mapping "entry-exit" -> SegmentState
+        self.states = {}
+
+    def get_or_create_state(self, segment):
+        if segment not in self.states:
+            self.states[segment] = SegmentState(
+                segment,
+                CUSUMDetector(self.cusum_threshold, self.cusum_drift),
+                SPRTDetector(self.sprt_threshold_upper, self.sprt_threshold_lower, self.h0, self.h1),
+                self.baselines.get(segment))
+        return self.states[segment]
+
+    def update(self, timestamp, car_id, point):
+        """
+        Feed one checkpoint passage (epoch seconds, in time order)
+        Returns: detection result dict if the passage completes a monitored
+            segment trip, else None
+        """
+        trip = self.join.add(timestamp, car_id, point)
+        if trip is None:
+            return None
+        entry, entered = trip
+        if self.segments is not None and (entry, point) not in self.segments:
+            return None
+        state = self.get_or_create_state(f"{entry}-{point}")
+        return self._trip(state, car_id, entered, timestamp)
+
+    def process_passages(self, passages):
+        """Feed an iterable of (timestamp, car_id, point); yields a result per trip"""
+        for timestamp, car_id, point in passages:
+            result = self.update(timestamp, car_id, point)
+            if result is not None:
+                yield result
+
+    def _trip(self, state, car_id, entered, exited):
+        minutes = (exited - entered) / 60.0
+        state.trips += 1
+        state.last_exit = exited
+
+        # Current conditions: EWMA mean/variance (plain averages over the first trips)
+        weight = max(1.0 / state.trips, Config.SEGMENT_STATS_ALPHA)
+        if state.mean is None:
+            state.mean = minutes
+        else:
+            d = minutes - state.mean
+            state.mean += weight * d
+            state.var = (1.0 - weight) * (state.var + weight * d * d)
+
+        # Baseline: learned from the first trips, then tracks normal traffic only
+        if state.learn_baseline and state.trips <= Config.SEGMENT_MIN_TRIPS:
+            state.baseline = minutes if state.baseline is None else (
+                state.baseline + (minutes - state.baseline) / state.trips)
+        elif not state.accident_active:
+            state.baseline += Config.SEGMENT_BASELINE_ALPHA * (minutes - state.baseline)
+
+        # Scale to the reference segment, then run the detectors
+        scaled = minutes * self.reference / state.baseline if state.baseline > 0 else self.reference
+        # CUSUMDetector accumulates observations below the prediction; travel time above
+        # the baseline is the mirror image, so observation and reference swap places
+        cusum_stat, cusum_alert = state.cusum.update(self.reference, scaled)
+        sprt_ratio, decision = state.sprt.update(scaled)
+        if decision == 'normal':
+            # Restart the test so long normal stretches cannot bury the next accident
+            state.sprt.reset()
+
+        votes = int(cusum_alert) + (decision == 'accident')
+        detected = state.trips >= Config.SEGMENT_MIN_TRIPS and votes >= Config.SEGMENT_REQUIRE_VOTES
+        cleared = False
+        if detected and not state.accident_active:
+            state.accident_active = True
+            state.accident_start_time = exited
+            state.accident_id = f"acc_{state.segment}_{int(self.rng.random() * 1000)}"
+            state.accident_trips = 0
+        elif state.accident_active:
+            # Check if cleared: current mean back within the CUSUM drift of the baseline
+            # (after a few trips, so the EWMA has caught up with the onset)
+            state.accident_trips += 1
+            current = state.mean * self.reference / state.baseline
+            if state.accident_trips >= Config.SEGMENT_CLEAR_TRIPS and current <= self.reference + self.cusum_drift:
+                state.accident_active = False
+                state.reset_detectors()
+                cleared = True
+
+        return {
+            'segment': state.segment,
+            'car_id': car_id,
+            'entry_time': entered,
+            'timestamp': exited,
+            'travel_time': minutes,
+            'baseline': state.baseline,
+            'cusum_stat': cusum_stat,
+            'sprt_ratio': sprt_ratio,
+            'accident_detected': detected,
+            'accident_active': state.accident_active,
+            'accident_cleared': cleared,
+            'accident_id': state.accident_id,
+            'confidence': votes / 2.0,
+        }
+
+    def get_status(self):
+        """Get status summary for all segments"""
+        status = {}
+        for segment, state in self.states.items():
+            status[segment] = {
+                'accident_active': state.accident_active,
+                'trips': state.trips,
+                'baseline': state.baseline,
+                'mean': state.mean,
+                'std': state.std,
+            }
+        return status
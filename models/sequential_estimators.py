@@ -1,47 +1,398 @@
 """
 Sequential Estimation Algorithms for Traffic Accident Detection
-Implements: ARMA/ARIMA, CUSUM, SPRT, Page-Hinkley
+Implements: ARMA/ARIMA, EWMA, Holt, RLS-AR, CUSUM, SPRT, Page-Hinkley
 """
 
+import json
+import time
 import numpy as np
-from scipy import stats
 from collections import deque
 from statsmodels.tsa.arima.model import ARIMA
 from config import Config
+from utils.metrics import metrics
+from utils.ring_buffer import FIELDS as HISTORY_FIELDS, SpeedHistory
+from utils.speed_batch import SpeedBatch, DetectionBatch
+
+
+def fit_arima_params(values, order=(1, 0, 1), start_params=None, maxiter=None):
+    """
+    Fit an ARIMA model on a window of speeds
+    start_params: previous solution; warm-started fits are capped at maxiter iterations
+    Returns: dict with fitted params and the Kalman filter state after the window
+    """
+    values = np.asarray(values, dtype=float)
+    model = ARIMA(values, order=order)
+    method_kwargs = {}
+    if start_params is not None:
+        # Pull AR/MA terms off the stationarity/invertibility boundary,
+        # where the optimizer's transformed parameters cannot move
+        start_params = np.array(start_params, dtype=float)
+        start_params[1:-1] = np.clip(start_params[1:-1], -0.9, 0.9)
+        method_kwargs['maxiter'] = maxiter or Config.ARIMA_MAX_ITER
+    # Parameter covariance is never used, so skip computing it
+    fitted = model.fit(start_params=start_params, cov_type='none', method_kwargs=method_kwargs)
+    filtered = fitted.filter_results
+    return {
+        'params': np.asarray(fitted.params, dtype=float),
+        'window_mean': float(values.mean()),
+        'window_std': float(values.std()),
+        'state': np.array(filtered.predicted_state[:, -1], dtype=float),
+        'state_cov': np.array(filtered.predicted_state_cov[:, :, -1], dtype=float),
+    }
 
 
 class ARIMAPredictor:
     """
     ARIMA model for time-series speed prediction
+    Parameters are estimated occasionally; between fits the Kalman filter
+    state is advanced by one observation per update()
     """
-    def __init__(self, order=(1, 0, 1)):
+    def __init__(self, order=(1, 0, 1), refit_interval=None, drift_threshold=None):
+        if order[1] != 0:
+            raise ValueError("Incremental ARIMA updates require d=0")
         self.order = order
+        self.refit_interval = refit_interval or Config.ARIMA_REFIT_INTERVAL
+        self.drift_threshold = drift_threshold or Config.ARIMA_DRIFT_THRESHOLD
         self.history = deque(maxlen=60)  # Keep last 60 readings
         self.model = None
         
+        # Last solution, reused to warm-start the next fit
+        self.params = None
+        self.window_mean = None
+        self.window_std = None
+        
+        # Fitted state space (None until the first successful fit)
+        self.mean = None
+        self.sigma2 = None
+        self.transition = None
+        self.selection = None
+        self.state = None
+        self.state_cov = None
+        
+        # Refit bookkeeping
+        self.samples_seen = 0
+        self.samples_since_fit = 0
+        self.residual_score = 1.0  # EWMA of squared standardized innovations
+        self.fit_pending = False  # set while an executor is fitting this window
+        self.last_good_forecast = Config.NORMAL_SPEED_MEAN
+        
     def update(self, speed):
-        """Add new speed observation"""
+        """Add new speed observation and advance the filter by one step"""
         self.history.append(speed)
+        self.samples_seen += 1
+        if self.state is not None:
+            self._filter(speed)
+    
+    def _filter(self, speed):
+        """Advance the Kalman filter state by one observation"""
+        self.samples_since_fit += 1
+        
+        # Kalman filter step (observation has no measurement noise)
+        innovation = speed - self.mean - self.state[0]
+        innovation_var = self.state_cov[0, 0]
+        if innovation_var <= 0:
+            return
+        gain = self.state_cov[:, 0] / innovation_var
+        filtered_state = self.state + gain * innovation
+        filtered_cov = self.state_cov - np.outer(gain, self.state_cov[0, :])
+        self.state = self.transition @ filtered_state
+        self.state_cov = (self.transition @ filtered_cov @ self.transition.T
+                          + self.sigma2 * np.outer(self.selection, self.selection))
+        
+        # Track residual diagnostics (expected value of z^2 is 1)
+        z2 = innovation * innovation / innovation_var
+        self.residual_score = 0.8 * self.residual_score + 0.2 * z2
+        
+    def needs_refit(self):
+        """Check whether parameters should be re-estimated"""
+        if len(self.history) < 10 or self.fit_pending:
+            return False
+        if self.state is None or self.residual_score > self.drift_threshold:
+            return True
+        if self.samples_since_fit < self.refit_interval:
+            return False
+        if self.window_changed():
+            return True
+        # Window looks like the fitted one; keep parameters until next schedule
+        self.samples_since_fit = 0
+        return False
+    
+    def window_changed(self):
+        """Check whether the window moved meaningfully since the last fit"""
+        values = np.fromiter(self.history, dtype=float, count=len(self.history))
+        tol = Config.ARIMA_WINDOW_CHANGE_TOL
+        scale = max(self.window_std, 1e-6)
+        return (abs(values.mean() - self.window_mean) > tol * scale or
+                abs(values.std() / scale - 1.0) > tol)
+    
+    def install(self, fit, replay=()):
+        """
+        Load fitted parameters and filter state from fit_arima_params()
+        replay: observations that arrived after the fitted window
+        """
+        self._load_params(fit['params'])
+        self.window_mean = fit['window_mean']
+        self.window_std = fit['window_std']
+        self.state = fit['state']
+        self.state_cov = fit['state_cov']
+        self.samples_since_fit = 0
+        self.residual_score = 1.0
+        for speed in replay:
+            self._filter(speed)
+    
+    def _load_params(self, params):
+        """Build the state space matrices for (const, ar..., ma..., sigma2)"""
+        p, _, q = self.order
+        ar = params[1:1 + p]
+        ma = params[1 + p:1 + p + q]
+        dim = max(p, q + 1)
+        
+        transition = np.zeros((dim, dim))
+        transition[:p, 0] = ar
+        transition[:-1, 1:] += np.eye(dim - 1)
+        selection = np.zeros(dim)
+        selection[0] = 1.0
+        selection[1:1 + q] = ma
+        
+        self.params = params
+        self.mean = float(params[0])
+        self.sigma2 = float(params[-1])
+        self.transition = transition
+        self.selection = selection
+    
+    def get_state(self):
+        """
+        Fixed-shape arrays of everything needed to resume (NaN = not fitted yet)
+        Inverse of set_state(); used by AccidentDetector.snapshot()
+        """
+        p, _, q = self.order
+        dim = max(p, q + 1)
+        history = np.full(self.history.maxlen, np.nan)
+        history[:len(self.history)] = self.history
+        fitted = self.state is not None
+        return {
+            'history': history,
+            'history_len': len(self.history),
+            'params': self.params if fitted else np.full(p + q + 2, np.nan),
+            'window_mean': self.window_mean if fitted else np.nan,
+            'window_std': self.window_std if fitted else np.nan,
+            'state': self.state if fitted else np.full(dim, np.nan),
+            'state_cov': self.state_cov if fitted else np.full((dim, dim), np.nan),
+            'samples_seen': self.samples_seen,
+            'samples_since_fit': self.samples_since_fit,
+            'residual_score': self.residual_score,
+            'last_good_forecast': self.last_good_forecast,
+        }
+    
+    def set_state(self, state):
+        """Resume from get_state() output (a fit in flight when it was taken is dropped)"""
+        self.history.clear()
+        self.history.extend(state['history'][:int(state['history_len'])].tolist())
+        self.samples_seen = int(state['samples_seen'])
+        self.samples_since_fit = int(state['samples_since_fit'])
+        self.residual_score = float(state['residual_score'])
+        self.last_good_forecast = float(state['last_good_forecast'])
+        self.fit_pending = False
+        if np.isnan(state['params']).any():
+            return
+        self._load_params(np.array(state['params'], dtype=float))
+        self.window_mean = float(state['window_mean'])
+        self.window_std = float(state['window_std'])
+        self.state = np.array(state['state'], dtype=float)
+        self.state_cov = np.array(state['state_cov'], dtype=float)
         
-    def predict(self):
+    def predict(self, refit=True):
         """
         Predict next speed value using ARIMA
+        refit: re-estimate inline when due (False when an executor does the fitting)
         Returns: predicted speed or current mean if insufficient data
         """
         if len(self.history) < 10:
             # Not enough data, return mean
             return np.mean(self.history) if self.history else Config.NORMAL_SPEED_MEAN
         
-        try:
-            # Fit ARIMA model
-            model = ARIMA(list(self.history), order=self.order)
-            fitted = model.fit()
-            # Forecast next value
-            forecast = fitted.forecast(steps=1)
-            return float(forecast[0])
-        except:
+        if refit and self.needs_refit():
+            try:
+                self.install(fit_arima_params(self.history, self.order, self.params))
+            except Exception:
+                # Keep the previous parameters if there are any
+                pass
+        
+        if self.state is None:
             # Fallback to moving average
             return np.mean(list(self.history)[-10:])
+        
+        if self.residual_score > self.drift_threshold:
+            # Parameters have drifted and no refit has landed yet
+            return self.last_good_forecast
+        
+        # One-step forecast from the predicted state
+        self.last_good_forecast = float(self.mean + self.state[0])
+        return self.last_good_forecast
+
+
+class EWMAPredictor:
+    """
+    Exponentially weighted moving average speed prediction
+    O(1) per sample
+    """
+    def __init__(self, alpha=None):
+        self.alpha = alpha or Config.EWMA_ALPHA
+        self.level = None
+        
+    def update(self, speed):
+        """Add new speed observation"""
+        if self.level is None:
+            self.level = speed
+        else:
+            self.level += self.alpha * (speed - self.level)
+            
+    def needs_refit(self):
+        return False
+    
+    def get_state(self):
+        return {'level': self.level if self.level is not None else np.nan}
+    
+    def set_state(self, state):
+        level = float(state['level'])
+        self.level = None if np.isnan(level) else level
+    
+    def predict(self, refit=True):
+        """Predict next speed value as the smoothed level"""
+        return float(self.level) if self.level is not None else Config.NORMAL_SPEED_MEAN
+
+
+class HoltPredictor:
+    """
+    Holt linear (level + trend) exponential smoothing
+    O(1) per sample
+    """
+    def __init__(self, alpha=None, beta=None):
+        self.alpha = alpha or Config.HOLT_ALPHA
+        self.beta = beta or Config.HOLT_BETA
+        self.level = None
+        self.trend = 0.0
+        
+    def update(self, speed):
+        """Add new speed observation"""
+        if self.level is None:
+            self.level = speed
+            return
+        prev_level = self.level
+        self.level = self.alpha * speed + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (self.level - prev_level) + (1 - self.beta) * self.trend
+        
+    def needs_refit(self):
+        return False
+    
+    def get_state(self):
+        return {'level': self.level if self.level is not None else np.nan, 'trend': self.trend}
+    
+    def set_state(self, state):
+        level = float(state['level'])
+        self.level = None if np.isnan(level) else level
+        self.trend = float(state['trend'])
+    
+    def predict(self, refit=True):
+        """Predict next speed value as level plus trend"""
+        if self.level is None:
+            return Config.NORMAL_SPEED_MEAN
+        return float(self.level + self.trend)
+
+
+class RLSARPredictor:
+    """
+    AR(p) model with intercept estimated by recursive least squares
+    O(p^2) per sample, exponential forgetting of old observations
+    The covariance trace is capped at its initial value: without fresh
+    information (a car holding a constant speed) forgetting alone would
+    inflate it until the estimates overflow
+    """
+    def __init__(self, order=None, forgetting=None):
+        self.order = order or Config.RLS_AR_ORDER
+        self.forgetting = forgetting or Config.RLS_FORGETTING
+        self.max_trace = Config.RLS_INITIAL_COV * (self.order + 1)
+        self.lags = deque(maxlen=self.order)
+        self.samples_seen = 0
+        self.reset()
+        
+    def reset(self):
+        """Forget the coefficients (the lags are kept)"""
+        self.coef = np.zeros(self.order + 1)
+        self.cov = np.eye(self.order + 1) * Config.RLS_INITIAL_COV
+        
+    def _regressors(self):
+        return np.concatenate(([1.0], self.lags))
+        
+    def update(self, speed):
+        """Add new speed observation and update coefficients"""
+        if len(self.lags) == self.order:
+            x = self._regressors()
+            px = self.cov @ x
+            gain = px / (self.forgetting + x @ px)
+            self.coef += gain * (speed - self.coef @ x)
+            self.cov = (self.cov - np.outer(gain, px)) / self.forgetting
+            trace = np.trace(self.cov)
+            if trace > self.max_trace:
+                self.cov *= self.max_trace / trace
+            if not np.isfinite(trace) or not np.isfinite(self.coef).all():
+                self.reset()
+        self.lags.appendleft(speed)
+        self.samples_seen += 1
+        
+    def needs_refit(self):
+        return False
+    
+    def get_state(self):
+        lags = np.full(self.order, np.nan)
+        lags[:len(self.lags)] = self.lags
+        return {'coef': self.coef.copy(), 'cov': self.cov.copy(), 'lags': lags,
+                'lags_len': len(self.lags), 'samples_seen': self.samples_seen}
+    
+    def set_state(self, state):
+        self.coef = np.array(state['coef'], dtype=float)
+        self.cov = np.array(state['cov'], dtype=float)
+        self.lags = deque(state['lags'][:int(state['lags_len'])].tolist(), maxlen=self.order)
+        self.samples_seen = int(state['samples_seen'])
+    
+    def predict(self, refit=True):
+        """
+        Predict next speed value from the last p speeds
+        Returns: predicted speed or recent mean until coefficients settle
+            (the last speed if the estimates went non-finite; they restart)
+        """
+        if self.samples_seen < 10:
+            return float(np.mean(self.lags)) if self.lags else Config.NORMAL_SPEED_MEAN
+        prediction = float(self.coef @ self._regressors())
+        if not np.isfinite(prediction):
+            self.reset()
+            return float(self.lags[0])
+        return prediction
+
+
+# Predictor names accepted by Config.PREDICTOR
+PREDICTORS = {
+    'arima': ARIMAPredictor,
+    'ewma': EWMAPredictor,
+    'holt': HoltPredictor,
+    'rls_ar': RLSARPredictor,
+}
+
+
+def make_predictor(name=None):
+    """Create a speed predictor by name (defaults to Config.PREDICTOR)"""
+    name = name or Config.PREDICTOR
+    if name not in PREDICTORS:
+        raise ValueError(f"Unknown predictor '{name}', expected one of {sorted(PREDICTORS)}")
+    return PREDICTORS[name]()
+
+
+def predictor_layout(name=None):
+    """
+    Per-car shape of each get_state() array of a predictor as configured
+    (the RLS order and the ARIMA window capacity show up here)
+    """
+    return {key: list(np.shape(value)) for key, value in make_predictor(name).get_state().items()}
 
 
 class CUSUMDetector:
@@ -76,21 +427,39 @@ class CUSUMDetector:
         self.cusum_stat = 0.0
 
 
+class GaussianLLR:
+    """
+    Gaussian log-likelihood ratio log N(x; h1) - log N(x; h0)
+    Evaluated directly in the log domain, works on scalars and arrays
+    """
+    def __init__(self, h0_mean, h0_std, h1_mean, h1_std):
+        self.h0_mean = h0_mean
+        self.h1_mean = h1_mean
+        # Precomputed constants per hypothesis
+        self.h0_scale = 0.5 / (h0_std * h0_std)
+        self.h1_scale = 0.5 / (h1_std * h1_std)
+        self.log_norm = float(np.log(h0_std / h1_std))
+        
+    def __call__(self, speed):
+        d0 = speed - self.h0_mean
+        d1 = speed - self.h1_mean
+        return self.log_norm + self.h0_scale * d0 * d0 - self.h1_scale * d1 * d1
+
+
 class SPRTDetector:
     """
     Sequential Probability Ratio Test (SPRT)
     Tests hypothesis: H0 (normal) vs H1 (accident)
     """
-    def __init__(self, threshold_upper=None, threshold_lower=None):
+    def __init__(self, threshold_upper=None, threshold_lower=None, h0=None, h1=None):
         self.threshold_upper = threshold_upper or Config.SPRT_THRESHOLD_UPPER
         self.threshold_lower = threshold_lower or Config.SPRT_THRESHOLD_LOWER
         self.log_likelihood_ratio = 0.0
         
-        # Hypothesis parameters
-        self.h0_mean = Config.NORMAL_SPEED_MEAN  # Normal traffic
-        self.h0_std = Config.NORMAL_SPEED_STD
-        self.h1_mean = Config.ACCIDENT_SPEED_MEAN  # Accident
-        self.h1_std = Config.ACCIDENT_SPEED_STD
+        # Hypothesis parameters as (mean, std); default: speeds in normal traffic vs accident
+        self.h0_mean, self.h0_std = h0 or (Config.NORMAL_SPEED_MEAN, Config.NORMAL_SPEED_STD)
+        self.h1_mean, self.h1_std = h1 or (Config.ACCIDENT_SPEED_MEAN, Config.ACCIDENT_SPEED_STD)
+        self.llr = GaussianLLR(self.h0_mean, self.h0_std, self.h1_mean, self.h1_std)
         
     def update(self, speed):
         """
@@ -98,24 +467,28 @@ class SPRTDetector:
         Returns: (likelihood_ratio, decision)
         decision: 'accident', 'normal', or 'continue'
         """
-        # Calculate likelihoods under both hypotheses
-        p_h0 = stats.norm.pdf(speed, self.h0_mean, self.h0_std)
-        p_h1 = stats.norm.pdf(speed, self.h1_mean, self.h1_std)
-        
-        # Avoid division by zero
-        if p_h0 > 0:
-            # Update log-likelihood ratio
-            self.log_likelihood_ratio += np.log(p_h1 / p_h0)
-        
-        # Make decision
+        self.log_likelihood_ratio += self.llr(float(speed))
+        return self.log_likelihood_ratio, self._decide()
+    
+    def update_batch(self, speeds):
+        """
+        Update SPRT with a sequence of speeds
+        Returns: (likelihood_ratios, decision)
+        likelihood_ratios: running ratio after each speed; decision is for the last one
+        """
+        increments = self.llr(np.asarray(speeds, dtype=float))
+        ratios = self.log_likelihood_ratio + np.cumsum(increments)
+        if len(ratios):
+            self.log_likelihood_ratio = float(ratios[-1])
+        return ratios, self._decide()
+    
+    def _decide(self):
+        """Compare the current ratio against both thresholds"""
         if self.log_likelihood_ratio >= self.threshold_upper:
-            decision = 'accident'
+            return 'accident'
         elif self.log_likelihood_ratio <= self.threshold_lower:
-            decision = 'normal'
-        else:
-            decision = 'continue'
-        
-        return self.log_likelihood_ratio, decision
+            return 'normal'
+        return 'continue'
     
     def reset(self):
         """Reset likelihood ratio"""
@@ -164,26 +537,119 @@ class PageHinkleyDetector:
         self.min_sum = 0.0
 
 
+class DetectorBank:
+    """
+    CUSUM, SPRT and Page-Hinkley statistics for a whole fleet
+    Struct-of-arrays layout: one row per car, updated in one vectorized step
+    """
+    # Per-car arrays and the value of a fresh row
+    STATE = (('cusum_stat', 0.0), ('log_likelihood_ratio', 0.0),
+             ('ph_sum_diff', 0.0), ('ph_min_sum', 0.0),
+             ('ph_baseline', Config.NORMAL_SPEED_MEAN))
+    
+    def __init__(self, capacity=64, cusum_threshold=None, cusum_drift=None,
+                 sprt_threshold_upper=None, sprt_threshold_lower=None,
+                 ph_threshold=None, ph_delta=None):
+        # Explicit zeros are valid settings (e.g. no CUSUM drift), so only None means default
+        self.cusum_threshold = cusum_threshold if cusum_threshold is not None else Config.CUSUM_THRESHOLD
+        self.cusum_drift = cusum_drift if cusum_drift is not None else Config.CUSUM_DRIFT
+        self.sprt_threshold_upper = (sprt_threshold_upper if sprt_threshold_upper is not None
+                                     else Config.SPRT_THRESHOLD_UPPER)
+        self.sprt_threshold_lower = (sprt_threshold_lower if sprt_threshold_lower is not None
+                                     else Config.SPRT_THRESHOLD_LOWER)
+        self.ph_threshold = ph_threshold if ph_threshold is not None else Config.PAGE_HINKLEY_THRESHOLD
+        self.ph_delta = ph_delta if ph_delta is not None else Config.PAGE_HINKLEY_DELTA
+        
+        # Hypothesis parameters (same as SPRTDetector)
+        self.h0_mean = Config.NORMAL_SPEED_MEAN
+        self.h0_std = Config.NORMAL_SPEED_STD
+        self.h1_mean = Config.ACCIDENT_SPEED_MEAN
+        self.h1_std = Config.ACCIDENT_SPEED_STD
+        self.llr = GaussianLLR(self.h0_mean, self.h0_std, self.h1_mean, self.h1_std)
+        
+        self.size = 0
+        self.cusum_stat = np.zeros(capacity)
+        self.log_likelihood_ratio = np.zeros(capacity)
+        self.ph_sum_diff = np.zeros(capacity)
+        self.ph_min_sum = np.zeros(capacity)
+        self.ph_baseline = np.full(capacity, Config.NORMAL_SPEED_MEAN)
+        
+    def add(self):
+        """
+        Allocate a row for a new car
+        Returns: row index
+        """
+        if self.size == len(self.cusum_stat):
+            self._grow(2 * len(self.cusum_stat))
+        row = self.size
+        self.size += 1
+        return row
+    
+    def _grow(self, capacity):
+        """Resize all per-car arrays, keeping existing rows"""
+        for name, fill in self.STATE:
+            old = getattr(self, name)
+            new = np.full(capacity, fill)
+            new[:len(old)] = old
+            setattr(self, name, new)
+            
+    def update(self, rows, speeds, predicted_speeds):
+        """
+        Update all detectors for the given rows (each row at most once)
+        Returns: (cusum_stat, cusum_alert, sprt_ratio, sprt_alert, ph_stat, ph_alert)
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        speeds = np.asarray(speeds, dtype=float)
+        predicted_speeds = np.asarray(predicted_speeds, dtype=float)
+        
+        # CUSUM on prediction residuals
+        residual = speeds - predicted_speeds
+        cusum = np.maximum(0.0, self.cusum_stat[rows] - residual - self.cusum_drift)
+        self.cusum_stat[rows] = cusum
+        
+        # SPRT log-likelihood ratio
+        llr = self.log_likelihood_ratio[rows] + self.llr(speeds)
+        self.log_likelihood_ratio[rows] = llr
+        
+        # Page-Hinkley against the per-car baseline
+        sum_diff = self.ph_sum_diff[rows] + (self.ph_baseline[rows] - speeds - self.ph_delta)
+        min_sum = np.minimum(self.ph_min_sum[rows], sum_diff)
+        self.ph_sum_diff[rows] = sum_diff
+        self.ph_min_sum[rows] = min_sum
+        ph = sum_diff - min_sum
+        
+        return (cusum, cusum > self.cusum_threshold,
+                llr, llr >= self.sprt_threshold_upper,
+                ph, ph > self.ph_threshold)
+    
+    def reset(self, rows, new_baseline=None):
+        """Reset statistics for the given rows with optional new baseline"""
+        self.cusum_stat[rows] = 0.0
+        self.log_likelihood_ratio[rows] = 0.0
+        self.ph_sum_diff[rows] = 0.0
+        self.ph_min_sum[rows] = 0.0
+        if new_baseline:
+            self.ph_baseline[rows] = new_baseline
+
+
 class DetectorSuite:
     """
     Holds the state of detectors for a single car
+    Test statistics live in row `index` of the shared DetectorBank
     """
-    def __init__(self, car_id):
+    def __init__(self, car_id, bank, predictor=None):
         self.car_id = car_id
-        self.arima = ARIMAPredictor()
-        self.cusum = CUSUMDetector()
-        self.sprt = SPRTDetector()
-        self.page_hinkley = PageHinkleyDetector()
+        self.predictor = make_predictor(predictor)
+        self.bank = bank
+        self.index = bank.add()
         
-        self.speed_history = deque(maxlen=Config.BUFFER_SIZE)
+        self.speed_history = SpeedHistory(Config.BUFFER_SIZE)
         self.accident_active = False
         self.accident_start_time = None
         self.accident_id = None
 
     def reset_detectors(self):
-        self.cusum.reset()
-        self.sprt.reset()
-        self.page_hinkley.reset()
+        self.bank.reset(self.index)
 
 
 class AccidentDetector:
@@ -191,20 +657,33 @@ class AccidentDetector:
     Main accident detection pipeline
     Manages multiple DetectorSuite instances (one per car)
     """
-    def __init__(self):
+    def __init__(self, fit_executor=None, predictor=None, seed=None):
         # Dictionary mapping car_id -> DetectorSuite
         self.detectors = {}
+        self.bank = DetectorBank()
+        # Predictor name for new suites (None = Config.PREDICTOR)
+        self.predictor = predictor
+        # Optional ARIMAFitExecutor; ARIMA refits run inline when None
+        # (pool fits finish on wall-clock time, so deterministic runs fit inline)
+        self.fit_executor = fit_executor
+        # Seeded generator for accident ids (None = Config.RANDOM_SEED)
+        self.rng = np.random.default_rng(seed if seed is not None else Config.RANDOM_SEED)
+        
+        # Suite lookup cache for producers that reuse their car_ids list
+        self._cached_car_ids = None
+        self._cached_suites = []
+        self._cached_unique = True
         
     def get_or_create_suite(self, car_id):
         if car_id not in self.detectors:
-            self.detectors[car_id] = DetectorSuite(car_id)
+            self.detectors[car_id] = DetectorSuite(car_id, self.bank, self.predictor)
         return self.detectors[car_id]
 
     def reset_all(self):
         """Reset all detector suites"""
         for suite in self.detectors.values():
             suite.accident_active = False
-            suite.reset_detectors()
+        self.bank.reset(slice(0, self.bank.size))
 
     def reset_car(self, car_id):
         """Reset detectors for a specific car"""
@@ -217,71 +696,247 @@ class AccidentDetector:
         Process incoming speed data for MULTIPLE cars
         Returns: list of detection results
         """
-        results = []
-        
         # Ensure input is a list (handle legacy single-dict if necessary, though simulator is updated)
         if not isinstance(speed_data_list, list):
             speed_data_list = [speed_data_list]
-            
-        for data in speed_data_list:
-            car_id = data.get('car_id', 'unknown')
-            suite = self.get_or_create_suite(car_id)
-            
-            speed = data['speed']
-            timestamp = data['timestamp']
-            
-            # Update history
-            suite.speed_history.append(data)
-            suite.arima.update(speed)
-            
-            # Get prediction
-            predicted_speed = suite.arima.predict()
-            
-            # Run all detectors
-            cusum_stat, cusum_alert = suite.cusum.update(speed, predicted_speed)
-            sprt_ratio, sprt_decision = suite.sprt.update(speed)
-            ph_stat, ph_alert = suite.page_hinkley.update(speed)
-            
-            # Voting mechanism
-            alerts = [cusum_alert, sprt_decision == 'accident', ph_alert]
-            vote_count = sum(alerts)
-            
-            # WARM-UP PERIOD
-            has_enough_data = len(suite.speed_history) >= Config.MIN_SAMPLES_FOR_DETECTION
-            
-            # Determine if accident detected
-            accident_detected = bool(has_enough_data and vote_count >= Config.REQUIRE_VOTES)
-            
-            confidence = vote_count / 3.0
-            
-            # Update accident state
-            if accident_detected and not suite.accident_active:
+        return self.process_batch(SpeedBatch.from_records(speed_data_list)).to_records()
+    
+    def process_batch(self, batch):
+        """
+        Process a columnar SpeedBatch for MULTIPLE cars
+        Returns: DetectionBatch row-aligned with the input
+        """
+        n = len(batch)
+        suites = self._suites_for(batch.car_ids)
+        out = {
+            'predicted_speed': np.zeros(n),
+            'cusum_stat': np.zeros(n),
+            'sprt_ratio': np.zeros(n),
+            'ph_stat': np.zeros(n),
+            'accident_detected': np.zeros(n, dtype=bool),
+            'accident_active': np.zeros(n, dtype=bool),
+            'confidence': np.zeros(n),
+        }
+        accident_ids = [None] * n
+        
+        for rows in self._waves(batch.car_ids):
+            self._process_wave(batch, rows, [suites[i] for i in rows.tolist()], out, accident_ids)
+        
+        return DetectionBatch(batch, accident_id=accident_ids, **out)
+    
+    def _suites_for(self, car_ids):
+        """Suites for each row; cached while producers reuse the same car_ids list"""
+        if car_ids is self._cached_car_ids and len(car_ids) == len(self._cached_suites):
+            return self._cached_suites
+        suites = [self.get_or_create_suite(car_id) for car_id in car_ids]
+        self._cached_car_ids = car_ids
+        self._cached_suites = suites
+        self._cached_unique = len(set(car_ids)) == len(car_ids)
+        return suites
+    
+    def _waves(self, car_ids):
+        """
+        Split rows so every car appears at most once per wave
+        The bank updates each row once per step, so repeated cars go to later waves
+        """
+        if self._cached_unique:
+            return [np.arange(len(car_ids))]
+        waves = []
+        seen = {}
+        for i, car_id in enumerate(car_ids):
+            wave = seen.get(car_id, -1) + 1
+            seen[car_id] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(i)
+        return [np.array(rows, dtype=np.intp) for rows in waves]
+    
+    def _process_wave(self, batch, rows, suites, out, accident_ids):
+        """Process batch rows in which every car appears at most once"""
+        if not suites:
+            return
+        executor = self.fit_executor
+        tick_start = time.monotonic()
+        timer = metrics.timer('traffic_detector_stage_seconds')
+        speeds = batch.speed[rows]
+        
+        # Update history and predictors
+        for suite, speed, ts, lat, lon in zip(suites, speeds.tolist(), batch.timestamp[rows].tolist(),
+                                              batch.lat[rows].tolist(), batch.lon[rows].tolist()):
+            suite.speed_history.append(speed, ts, lat, lon)
+            suite.predictor.update(speed)
+            if executor is not None and suite.predictor.needs_refit():
+                executor.submit(suite.predictor)
+        timer.lap('history')
+        
+        # Install whichever refits finish within the tick deadline
+        if executor is not None:
+            executor.collect(tick_start + executor.deadline)
+            timer.lap('fit_collect')
+        
+        # Get predictions (pending refits keep forecasting with the last good parameters)
+        refit = executor is None
+        predictions = np.array([suite.predictor.predict(refit=refit) for suite in suites], dtype=float)
+        timer.lap('predict')
+        
+        # Run all detectors for every car at once
+        bank_rows = np.fromiter((suite.index for suite in suites), dtype=np.intp, count=len(suites))
+        (cusum_stats, cusum_alerts, sprt_ratios, sprt_alerts,
+         ph_stats, ph_alerts) = self.bank.update(bank_rows, speeds, predictions)
+        
+        # Voting mechanism
+        vote_counts = cusum_alerts.astype(int) + sprt_alerts + ph_alerts
+        
+        # WARM-UP PERIOD
+        history_len = np.fromiter((len(suite.speed_history) for suite in suites),
+                                  dtype=int, count=len(suites))
+        has_enough_data = history_len >= Config.MIN_SAMPLES_FOR_DETECTION
+        
+        # Determine if accident detected
+        accident_detected = has_enough_data & (vote_counts >= Config.REQUIRE_VOTES)
+        active = np.fromiter((suite.accident_active for suite in suites), dtype=bool, count=len(suites))
+        timer.lap('detectors')
+        
+        # Update accident state (only rows whose state can change)
+        for i in np.flatnonzero(accident_detected != active).tolist():
+            suite = suites[i]
+            if accident_detected[i]:
                 suite.accident_active = True
-                suite.accident_start_time = timestamp
-                suite.accident_id = f"acc_{car_id}_{int(np.random.random() * 1000)}"
-                
-            elif not accident_detected and suite.accident_active:
+                suite.accident_start_time = batch.timestamp_iso[rows[i]]
+                suite.accident_id = f"acc_{suite.car_id}_{int(self.rng.random() * 1000)}"
+                active[i] = True
+            else:
                 # Check if cleared
-                recent_speeds = [d['speed'] for d in list(suite.speed_history)[-5:]]
-                if len(recent_speeds) >= 5 and np.mean(recent_speeds) > 40:
+                recent_speeds = suite.speed_history.tail(Config.CLEAR_WINDOW)
+                if len(recent_speeds) >= Config.CLEAR_WINDOW and recent_speeds.mean() > Config.CLEAR_SPEED:
                     suite.accident_active = False
                     suite.reset_detectors()
-            
-            results.append({
-                'car_id': car_id,
-                'timestamp': timestamp,
-                'speed': speed,
-                'predicted_speed': round(predicted_speed, 2),
-                'cusum_stat': round(cusum_stat, 2),
-                'sprt_ratio': round(sprt_ratio, 2),
-                'ph_stat': round(ph_stat, 2),
-                'accident_detected': accident_detected,
-                'accident_active': suite.accident_active,
-                'accident_id': suite.accident_id,
-                'confidence': round(confidence, 2)
-            })
-            
-        return results
+                    active[i] = False
+        
+        out['predicted_speed'][rows] = np.round(predictions, 2)
+        out['cusum_stat'][rows] = np.round(cusum_stats, 2)
+        out['sprt_ratio'][rows] = np.round(sprt_ratios, 2)
+        out['ph_stat'][rows] = np.round(ph_stats, 2)
+        out['accident_detected'][rows] = accident_detected
+        out['accident_active'][rows] = active
+        out['confidence'][rows] = np.round(vote_counts / 3.0, 2)
+        for i, row in enumerate(rows.tolist()):
+            accident_ids[row] = suites[i].accident_id
+        timer.lap('state')
+    
+    def snapshot(self, car_ids=None, history=None):
+        """
+        State of the given cars (default: all) as a dict of arrays with one
+        row per car, plus the predictor name and state layout and the id
+        generator state; restore() loads it back
+        history: speed history samples kept per car (default Config.SNAPSHOT_HISTORY_SAMPLES);
+            detection reads only speeds, so timestamps and coordinates are left out
+        """
+        history = history or Config.SNAPSHOT_HISTORY_SAMPLES
+        if car_ids is None:
+            car_ids = list(self.detectors)
+        suites = [self.detectors[car_id] for car_id in car_ids if car_id in self.detectors]
+        rows = np.fromiter((suite.index for suite in suites), dtype=np.intp, count=len(suites))
+        
+        speeds = np.full((len(suites), history), np.nan)
+        lengths = np.zeros(len(suites), dtype=int)
+        for i, suite in enumerate(suites):
+            recent = suite.speed_history.tail(history)
+            lengths[i] = len(recent)
+            speeds[i, :lengths[i]] = recent
+        
+        state = {
+            'predictor': np.array(self.predictor or Config.PREDICTOR),
+            'layout': np.array(json.dumps(predictor_layout(self.predictor))),
+            'rng_state': np.array(json.dumps(self.rng.bit_generator.state)),
+            'car_id': np.array([suite.car_id for suite in suites], dtype=str),
+            'accident_active': np.array([suite.accident_active for suite in suites], dtype=bool),
+            'accident_start_time': np.array([suite.accident_start_time or '' for suite in suites], dtype=str),
+            'accident_id': np.array([suite.accident_id or '' for suite in suites], dtype=str),
+            'history': speeds,
+            'history_len': lengths,
+        }
+        for name, _ in DetectorBank.STATE:
+            state[name] = getattr(self.bank, name)[rows]
+        
+        predictor_states = [suite.predictor.get_state() for suite in suites]
+        for key in (predictor_states[0] if predictor_states else ()):
+            state[f'predictor_{key}'] = np.array([s[key] for s in predictor_states])
+        return state
+    
+    def restore(self, state):
+        """
+        Load snapshot() output: missing cars are created, existing ones overwritten
+        A snapshot from a different predictor restores everything but the
+        predictor, which is warmed up on the saved speed history instead
+        Returns: number of cars restored
+        Raises: ValueError, before any car is touched, if the snapshot is
+            incomplete or its predictor state does not fit the configured
+            predictor (e.g. RLS_AR_ORDER changed since it was taken)
+        """
+        same_predictor = self._check_snapshot(state)
+        car_ids = state['car_id'].tolist()
+        predictor_keys = [key for key in state if key.startswith('predictor_')]
+        suites = [self.get_or_create_suite(car_id) for car_id in car_ids]
+        rows = np.fromiter((suite.index for suite in suites), dtype=np.intp, count=len(suites))
+        for name, _ in DetectorBank.STATE:
+            getattr(self.bank, name)[rows] = state[name]
+        
+        for i, suite in enumerate(suites):
+            speeds = state['history'][i, :int(state['history_len'][i])]
+            samples = np.full((len(HISTORY_FIELDS), len(speeds)), np.nan)
+            samples[0] = speeds
+            suite.speed_history.load(samples)
+            if same_predictor:
+                suite.predictor.set_state({key[len('predictor_'):]: state[key][i] for key in predictor_keys})
+            else:
+                suite.predictor = make_predictor(self.predictor)
+                for speed in speeds.tolist():
+                    suite.predictor.update(speed)
+            suite.accident_active = bool(state['accident_active'][i])
+            suite.accident_start_time = str(state['accident_start_time'][i]) or None
+            suite.accident_id = str(state['accident_id'][i]) or None
+        
+        self.rng.bit_generator.state = json.loads(str(state['rng_state']))
+        return len(suites)
+    
+    def _check_snapshot(self, state):
+        """
+        Validate snapshot() output against this detector's configuration
+        Returns: whether the snapshot's predictor state can be loaded as is
+        """
+        required = ['predictor', 'layout', 'rng_state', 'car_id', 'accident_active', 'accident_start_time',
+                    'accident_id', 'history', 'history_len'] + [name for name, _ in DetectorBank.STATE]
+        missing = [key for key in required if key not in state]
+        if missing:
+            raise ValueError(f"snapshot is missing {missing}")
+        cars = len(state['car_id'])
+        per_car = required[3:] + [key for key in state if key.startswith('predictor_')]
+        ragged = [key for key in per_car if np.ndim(state[key]) == 0 or len(state[key]) != cars]
+        if ragged or np.ndim(state['history']) != 2:
+            raise ValueError(f"snapshot arrays do not have one row per car: {ragged or ['history']}")
+        
+        predictor = self.predictor or Config.PREDICTOR
+        if str(state['predictor']) != predictor:
+            return False
+        saved = json.loads(str(state['layout']))
+        expected = predictor_layout(predictor)
+        if saved != expected:
+            raise ValueError(f"snapshot {predictor} state layout {saved} does not match the "
+                             f"configured {expected}")
+        stored = {key[len('predictor_'):]: list(state[key].shape[1:])
+                  for key in state if key.startswith('predictor_')}
+        if cars and stored != expected:
+            raise ValueError(f"snapshot {predictor} state arrays {stored} do not match their layout {expected}")
+        return True
+    
+    def clear(self):
+        """Drop every car (e.g. to start cold after a failed restore)"""
+        self.detectors = {}
+        self.bank = DetectorBank()
+        self._cached_car_ids = None
+        self._cached_suites = []
+        self._cached_unique = True
     
     def get_status(self):
         """Get status summary for all cars"""
@@ -10,6 +10,15 @@ let speedChart;
 let isMonitoring = false;
 let selectedCarId = null;
 
+// Reconstructed traffic state (server sends keyframes + deltas)
+const trafficState = {
+    seq: null,
+    timestamp: null,
+    cars: {},           // { carId: car }
+    accidents: {},      // { accidentId: accident }
+    simulatorStatus: {}
+};
+
 // Map elements
 const carMarkers = {}; // { carId: marker }
 const carCircles = {}; // { carId: circle }
@@ -146,7 +155,15 @@ function initializeSocket() {
     });
 
     socket.on('traffic_update', (data) => {
-        updateDashboard(data);
+        if (applyTrafficUpdate(data)) {
+            updateDashboard({
+                timestamp: trafficState.timestamp,
+                cars: Object.values(trafficState.cars),
+                active_accidents: Object.values(trafficState.accidents),
+                user_report: data.user_report,
+                simulator_status: trafficState.simulatorStatus
+            });
+        }
     });
 
     socket.on('accident_alert', (accident) => {
@@ -163,6 +180,56 @@ function initializeSocket() {
     });
 }
 
+/**
+ * Apply a keyframe or delta to the reconstructed traffic state
+ * Returns false if the update could not be applied (waiting for a keyframe)
+ */
+function applyTrafficUpdate(data) {
+    if (data.type === 'keyframe') {
+        trafficState.cars = {};
+        addCarColumns(data.cars);
+        trafficState.accidents = {};
+        data.active_accidents.forEach(a => { trafficState.accidents[a.id] = a; });
+        trafficState.simulatorStatus = data.simulator_status || {};
+    } else {
+        // Deltas only apply on top of the previous payload
+        if (trafficState.seq === null || data.seq !== trafficState.seq + 1) {
+            trafficState.seq = null;
+            socket.emit('request_keyframe');
+            return false;
+        }
+        // Changed values: { field: { carId: value } }
+        Object.entries(data.cars).forEach(([field, values]) => {
+            Object.entries(values).forEach(([carId, value]) => {
+                if (trafficState.cars[carId]) trafficState.cars[carId][field] = value;
+            });
+        });
+        if (data.added_cars) addCarColumns(data.added_cars);
+        data.removed_cars.forEach(carId => { delete trafficState.cars[carId]; });
+        data.accidents_added.forEach(a => { trafficState.accidents[a.id] = a; });
+        data.accidents_removed.forEach(id => { delete trafficState.accidents[id]; });
+        Object.assign(trafficState.simulatorStatus, data.simulator_status);
+        data.simulator_status_removed.forEach(carId => { delete trafficState.simulatorStatus[carId]; });
+    }
+
+    trafficState.seq = data.seq;
+    trafficState.timestamp = data.timestamp;
+    Object.values(trafficState.cars).forEach(car => { car.timestamp = data.timestamp; });
+    return true;
+}
+
+/**
+ * Add cars from columnar data: { car_id: [...], field: [...] }
+ */
+function addCarColumns(columns) {
+    const fields = Object.keys(columns);
+    columns.car_id.forEach((carId, i) => {
+        const car = {};
+        fields.forEach(field => { car[field] = columns[field][i]; });
+        trafficState.cars[carId] = car;
+    });
+}
+
 /**
  * Initialize control buttons
  */
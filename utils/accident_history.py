@@ -0,0 +1,157 @@
+"""
+Persistent accident history for Traffic Accident Detection System
+Cleared accidents are appended to a SQLite database in WAL mode, indexed by
+detection time, car id and location. The newest entries are also kept in a
+bounded in-memory cache, so memory stays flat however long the instance runs
+and the common "latest accidents" query never touches the disk
+"""
+
+import json
+import sqlite3
+import threading
+from collections import deque
+
+from config import Config
+from utils.ring_buffer import to_epoch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accidents (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    accident_id TEXT NOT NULL,
+    car_id TEXT NOT NULL,
+    detected_at TEXT,
+    detected_ts REAL,
+    cleared_at TEXT,
+    lat REAL,
+    lon REAL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accidents_detected_ts ON accidents (detected_ts);
+CREATE INDEX IF NOT EXISTS accidents_car ON accidents (car_id, seq);
+CREATE INDEX IF NOT EXISTS accidents_location ON accidents (lat, lon);
+"""
+
+
+class AccidentHistory:
+    """
+    Append-only accident history with keyset-paginated queries
+    Entries come back newest first, each with its sequence number 'seq';
+    pass the last seq of a page as `before` to get the next page
+    path: SQLite database file (':memory:' keeps it in process, e.g. for tests)
+    cache_size: newest entries kept in memory
+    """
+    def __init__(self, path=None, cache_size=None):
+        self.path = path or Config.HISTORY_DB_PATH
+        self.cache = deque(maxlen=cache_size or Config.HISTORY_CACHE_SIZE)
+        # One connection shared by the stream worker and request handlers
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.count = self.db.execute('SELECT COUNT(*) FROM accidents').fetchone()[0]
+
+        # Warm the cache with the newest stored entries
+        rows = self.db.execute('SELECT seq, record FROM accidents ORDER BY seq DESC LIMIT ?',
+                               (self.cache.maxlen,)).fetchall()
+        self.cache.extend(_entry(seq, record) for seq, record in reversed(rows))
+
+    def __len__(self):
+        return self.count
+
+    def append(self, accident):
+        """
+        Store a (cleared) accident dict
+        Returns: the stored entry (a copy of accident with its 'seq')
+        """
+        location = accident.get('location') or {}
+        record = json.dumps(accident)
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO accidents (accident_id, car_id, detected_at, detected_ts, cleared_at, lat, lon, record) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (accident['id'], accident['car_id'], accident.get('detected_at'),
+                 _epoch(accident.get('detected_at')), accident.get('cleared_at'),
+                 location.get('lat'), location.get('lon'), record))
+            self.db.commit()
+            entry = _entry(cursor.lastrowid, record)
+            self.cache.append(entry)
+            self.count += 1
+        return entry
+
+    def query(self, limit=None, before=None, car_id=None, since=None, until=None, bbox=None):
+        """
+        One page of history, newest first
+        limit: entries per page (default Config.HISTORY_PAGE_SIZE, capped at HISTORY_MAX_PAGE)
+        before: only entries with seq below this (the previous page's next_before)
+        car_id: only this car
+        since, until: detection time range in epoch seconds (inclusive)
+        bbox: (min_lat, min_lon, max_lat, max_lon) around the detection location
+        Returns: (entries, next_before), next_before None on the last page
+        """
+        limit = max(1, min(limit or Config.HISTORY_PAGE_SIZE, Config.HISTORY_MAX_PAGE))
+        filtered = car_id is not None or since is not None or until is not None or bbox is not None
+        with self.lock:
+            if not filtered:
+                page = self._from_cache(limit + 1, before)
+                if page is not None:
+                    return _paginate(page, limit)
+
+            clauses, params = [], []
+            if before is not None:
+                clauses.append('seq < ?')
+                params.append(before)
+            if car_id is not None:
+                clauses.append('car_id = ?')
+                params.append(car_id)
+            if since is not None:
+                clauses.append('detected_ts >= ?')
+                params.append(since)
+            if until is not None:
+                clauses.append('detected_ts <= ?')
+                params.append(until)
+            if bbox is not None:
+                clauses.append('lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?')
+                min_lat, min_lon, max_lat, max_lon = bbox
+                params.extend((min_lat, max_lat, min_lon, max_lon))
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+            rows = self.db.execute(f'SELECT seq, record FROM accidents {where}ORDER BY seq DESC LIMIT ?',
+                                   params + [limit + 1]).fetchall()
+        return _paginate([_entry(seq, record) for seq, record in rows], limit)
+
+    def _from_cache(self, count, before):
+        """Newest `count` entries below `before` if the cache can answer, else None"""
+        if not self.cache:
+            return [] if not self.count else None
+        entries = []
+        for entry in reversed(self.cache):
+            if before is not None and entry['seq'] >= before:
+                continue
+            entries.append(entry)
+            if len(entries) == count:
+                return entries
+        # Ran out of cached entries: complete only if the cache holds the whole history
+        return entries if len(self.cache) == self.count else None
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def _entry(seq, record):
+    entry = json.loads(record)
+    entry['seq'] = seq
+    return entry
+
+
+def _paginate(entries, limit):
+    if len(entries) > limit:
+        return entries[:limit], entries[limit - 1]['seq']
+    return entries, None
+
+
+def _epoch(timestamp):
+    if timestamp is None:
+        return None
+    value = to_epoch(timestamp)
+    return None if value != value else value  # NaN -> NULL
@@ -0,0 +1,49 @@
+"""
+Registry of active accidents for the data stream worker
+"""
+
+
+class AccidentRegistry:
+    """
+    Active accidents indexed by accident id and by car id
+    Insert, lookup and clearance are O(1); to_list() keeps detection order
+    """
+    def __init__(self):
+        self.by_id = {}   # accident_id -> accident dict
+        self.by_car = {}  # car_id -> accident_id
+        self.cleared = 0  # accidents cleared by this process
+        
+    def __len__(self):
+        return len(self.by_id)
+    
+    def __contains__(self, accident_id):
+        return accident_id in self.by_id
+    
+    def add(self, accident):
+        """Register a new active accident"""
+        self.by_id[accident['id']] = accident
+        self.by_car[accident['car_id']] = accident['id']
+        
+    def get(self, accident_id):
+        return self.by_id.get(accident_id)
+    
+    def for_car(self, car_id):
+        """Active accident for a car, or None"""
+        accident_id = self.by_car.get(car_id)
+        return self.by_id.get(accident_id) if accident_id is not None else None
+    
+    def clear(self, accident_id):
+        """
+        Remove an accident from the registry
+        Returns: the removed accident, or None if it was not active
+        """
+        accident = self.by_id.pop(accident_id, None)
+        if accident is not None:
+            self.cleared += 1
+            if self.by_car.get(accident['car_id']) == accident_id:
+                del self.by_car[accident['car_id']]
+        return accident
+    
+    def to_list(self):
+        """List view for API responses and socket payloads"""
+        return list(self.by_id.values())
@@ -0,0 +1,79 @@
+"""
+Clocks for Traffic Accident Detection System
+The simulator, detector and stream worker read time through a clock so the
+same code runs in real time or fast-forwarded on a virtual timeline
+"""
+
+import time
+from datetime import datetime, timedelta
+from config import Config
+
+
+class SystemClock:
+    """
+    Wall-clock time; sleep blocks for real
+    """
+    virtual = False
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        """Current time in epoch seconds"""
+        return time.time()
+
+    def monotonic(self):
+        """Seconds on a clock that never jumps (for intervals and deadlines, not timestamps)"""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Simulated time that only moves when advanced
+    sleep() advances the clock instantly, so a scenario runs as fast as the
+    CPU allows and the same seed replays the same timeline
+    """
+    virtual = True
+
+    def __init__(self, start=None):
+        # Fixed default start so runs without an explicit start are reproducible
+        if start is None:
+            start = datetime(2024, 1, 1, 12, 0, 0)
+        elif isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        self.start = start
+        self.elapsed = 0.0
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def time(self):
+        """Current time in epoch seconds"""
+        return self.start.timestamp() + self.elapsed
+
+    def monotonic(self):
+        """Seconds since the clock started (virtual time never jumps)"""
+        return self.elapsed
+
+    def advance(self, seconds):
+        self.elapsed += seconds
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+        # Still yield so other (green) threads get to run
+        time.sleep(0)
+
+
+def make_clock(mode=None, start=None):
+    """
+    Build the clock named by mode ('system' or 'virtual'; None = Config.CLOCK)
+    """
+    mode = mode or Config.CLOCK
+    if mode == 'system':
+        return SystemClock()
+    if mode == 'virtual':
+        return VirtualClock(start if start is not None else Config.VIRTUAL_CLOCK_START)
+    raise ValueError(f"Unknown clock '{mode}', expected 'system' or 'virtual'")
@@ -4,59 +4,39 @@ Generates realistic GPS speed data and user reports for demonstration
 """
 
 import numpy as np
-from datetime import datetime, timedelta
-import random
 from config import Config
-
-
-class Car:
-    """Represents a single simulated car"""
-    def __init__(self, car_id):
-        self.id = car_id
-        self.accident_active = False
-        self.accident_start_time = None
-        self.accident_duration = 0
-        
-        # Assign fixed random offsets for map visualization so cars don't overlap perfectly
-        self.lat_offset = np.random.normal(0, 0.005)
-        self.lon_offset = np.random.normal(0, 0.005)
-        
-    def check_accident_status(self):
-        """Update accident status"""
-        if self.accident_active:
-            elapsed = (datetime.now() - self.accident_start_time).total_seconds()
-            if elapsed >= self.accident_duration:
-                self.accident_active = False
-                return False
-            return True
-        else:
-            # Random chance of new accident
-            # Reduced probability since we now have multiple cars checkng every interval
-            if random.random() < (Config.ACCIDENT_PROBABILITY / 2.0):
-                self.accident_active = True
-                self.accident_start_time = datetime.now()
-                self.accident_duration = max(30, np.random.normal(
-                    Config.ACCIDENT_DURATION_MEAN,
-                    Config.ACCIDENT_DURATION_STD
-                ))
-                return True
-            return False
-
-    def inject_accident(self, duration):
-        self.accident_active = True
-        self.accident_start_time = datetime.now()
-        self.accident_duration = duration
-
-    def clear_accident(self):
-        self.accident_active = False
+from utils.clock import SystemClock
+from utils.speed_batch import SpeedBatch
 
 
 class TrafficSimulator:
-    def __init__(self, num_cars=None):
-        self.current_time = datetime.now()
+    """
+    Array-backed simulator: per-car state lives in NumPy arrays (one entry
+    per car) and each tick is generated for the whole fleet at once
+    All randomness comes from one seeded generator and all time from the
+    clock, so a seed plus a VirtualClock replays the same scenario
+    """
+    def __init__(self, num_cars=None, clock=None, seed=None):
+        self.clock = clock if clock is not None else SystemClock()
+        self.rng = np.random.default_rng(seed if seed is not None else Config.RANDOM_SEED)
+        self.current_time = self.clock.now()
         # Initialize cars based on config
         target_cars = num_cars if num_cars is not None else Config.NUM_CARS
-        self.cars = [Car(f"Car{i+1}") for i in range(target_cars)]
+        self.car_ids = [f"Car{i+1}" for i in range(target_cars)]
+        self.car_index = {car_id: i for i, car_id in enumerate(self.car_ids)}
+        
+        # Accident state per car (times in epoch seconds)
+        self.accident_active = np.zeros(target_cars, dtype=bool)
+        self.accident_start_time = np.zeros(target_cars)
+        self.accident_duration = np.zeros(target_cars)
+        
+        # Assign fixed random offsets for map visualization so cars don't overlap perfectly
+        self.lat_offset = self.rng.normal(0, 0.005, target_cars)
+        self.lon_offset = self.rng.normal(0, 0.005, target_cars)
+        
+    @property
+    def num_cars(self):
+        return len(self.car_ids)
         
     def _get_time_of_day_factor(self, timestamp):
         """
@@ -68,67 +48,89 @@ class TrafficSimulator:
         elif hour >= 23 or hour < 5: return 1.2
         else: return 1.0
     
+    def _update_accidents(self, now):
+        """
+        Expire finished accidents and start new ones
+        Returns: bool array of cars in an accident this tick
+        """
+        n = self.num_cars
+        active = self.accident_active
+        
+        # Accidents that ran their course end this tick (no new one the same tick)
+        expired = active & (now - self.accident_start_time >= self.accident_duration)
+        active &= ~expired
+        
+        # Random chance of new accident
+        # Reduced probability since we now have multiple cars checking every interval
+        started = ~active & ~expired & (self.rng.random(n) < Config.ACCIDENT_PROBABILITY / 2.0)
+        count = int(started.sum())
+        if count:
+            active |= started
+            self.accident_start_time[started] = now
+            self.accident_duration[started] = np.maximum(30, self.rng.normal(
+                Config.ACCIDENT_DURATION_MEAN,
+                Config.ACCIDENT_DURATION_STD,
+                count
+            ))
+        return active.copy()
+    
     def generate_speed_data(self):
         """
         Generates realistic GPS speed data for ALL cars
         Returns: list of dicts
         """
-        self.current_time = datetime.now()
+        return self.generate_speed_batch().to_records()
+    
+    def generate_speed_batch(self):
+        """
+        Generates realistic GPS speed data for ALL cars
+        Returns: columnar SpeedBatch (one row per car)
+        """
+        self.current_time = self.clock.now()
         time_factor = self._get_time_of_day_factor(self.current_time)
         base_speed_target = Config.NORMAL_SPEED_MEAN * time_factor
+        n = self.num_cars
+        now = self.current_time.timestamp()
         
-        results = []
+        is_accident = self._update_accidents(now)
         
-        for car in self.cars:
-            is_accident = car.check_accident_status()
-            
-            if is_accident:
-                speed = np.random.normal(Config.ACCIDENT_SPEED_MEAN, Config.ACCIDENT_SPEED_STD)
-            else:
-                speed = np.random.normal(base_speed_target, Config.NORMAL_SPEED_STD)
-                speed += np.random.normal(0, Config.NOISE_LEVEL)
-            
-            speed = max(0, min(speed, 120))
-            
-            # Wiggle location slightly around the car's general area
-            current_lat = Config.DEFAULT_LAT + car.lat_offset + np.random.normal(0, 0.0002)
-            current_lon = Config.DEFAULT_LON + car.lon_offset + np.random.normal(0, 0.0002)
-            
-            results.append({
-                'car_id': car.id,
-                'timestamp': self.current_time.isoformat(),
-                'speed': round(speed, 2),
-                'location': {
-                    'lat': current_lat,
-                    'lon': current_lon
-                },
-                'confidence': round(random.uniform(0.75, 1.0), 2),
-                'is_accident': is_accident
-            })
-            
-        return results
+        normal_speed = (self.rng.normal(base_speed_target, Config.NORMAL_SPEED_STD, n)
+                        + self.rng.normal(0, Config.NOISE_LEVEL, n))
+        accident_speed = self.rng.normal(Config.ACCIDENT_SPEED_MEAN, Config.ACCIDENT_SPEED_STD, n)
+        speed = np.clip(np.where(is_accident, accident_speed, normal_speed), 0, 120).round(2)
+        
+        # Wiggle location slightly around the car's general area
+        lat = Config.DEFAULT_LAT + self.lat_offset + self.rng.normal(0, 0.0002, n)
+        lon = Config.DEFAULT_LON + self.lon_offset + self.rng.normal(0, 0.0002, n)
+        confidence = self.rng.uniform(0.75, 1.0, n).round(2)
+        
+        return SpeedBatch(
+            self.car_ids, speed, [self.current_time.isoformat()] * n,
+            timestamp=np.full(n, now), lat=lat, lon=lon,
+            confidence=confidence, is_accident=is_accident, positions=self.car_index)
     
     def generate_user_report(self):
         """
         Generates simulated user accident report from a random car if active
         """
         # Pick a random car that is in an accident
-        accident_cars = [c for c in self.cars if c.accident_active]
+        accident_cars = np.flatnonzero(self.accident_active)
         
-        if accident_cars:
-            car = random.choice(accident_cars)
-            if random.random() < 0.4: # 40% chance of report if accident exists
+        if len(accident_cars):
+            i = int(self.rng.choice(accident_cars))
+            car_id = self.car_ids[i]
+            if self.rng.random() < 0.4: # 40% chance of report if accident exists
                 return {
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': self.clock.now().isoformat(),
                     'type': 'accident',
-                    'severity': random.choice(['minor', 'major']),
+                    'severity': str(self.rng.choice(['minor', 'major'])),
                     'location': {
-                        'lat': Config.DEFAULT_LAT + car.lat_offset,
-                        'lon': Config.DEFAULT_LON + car.lon_offset
+                        'lat': Config.DEFAULT_LAT + float(self.lat_offset[i]),
+                        'lon': Config.DEFAULT_LON + float(self.lon_offset[i])
                     },
-                    'user_id': f'user_{random.randint(1000, 9999)}',
-                    'car_id': car.id,
-                    'description': f'Accident reported near {car.id}'
+                    'user_id': f'user_{int(self.rng.integers(1000, 10000))}',
+                    'car_id': car_id,
+                    'description': f'Accident reported near {car_id}'
                 }
         return None
     
@@ -136,38 +138,36 @@ class TrafficSimulator:
         """
         Returns status of all cars
         """
-        status = {}
-        for car in self.cars:
-            if car.accident_active:
-                elapsed = (datetime.now() - car.accident_start_time).total_seconds()
-                status[car.id] = {
-                    'accident_active': True,
-                    'duration': round(elapsed, 1),
-                    'remaining': round(car.accident_duration - elapsed, 1)
-                }
-            else:
-                status[car.id] = {'accident_active': False}
+        status = {car_id: {'accident_active': False} for car_id in self.car_ids}
+        now = self.clock.time()
+        for i in np.flatnonzero(self.accident_active).tolist():
+            elapsed = now - float(self.accident_start_time[i])
+            status[self.car_ids[i]] = {
+                'accident_active': True,
+                'duration': round(elapsed, 1),
+                'remaining': round(float(self.accident_duration[i]) - elapsed, 1)
+            }
         return status
     
     def inject_accident(self, duration=120, car_id=None):
         """
         Manually inject an accident
         """
-        target_car = None
-        if car_id:
-            target_car = next((c for c in self.cars if c.id == car_id), None)
+        target = self.car_index.get(car_id) if car_id else None
         
-        if not target_car:
+        if target is None:
             # Pick random car not already in accident
-            available_cars = [c for c in self.cars if not c.accident_active]
-            if available_cars:
-                target_car = random.choice(available_cars)
+            available_cars = np.flatnonzero(~self.accident_active)
+            if len(available_cars):
+                target = int(self.rng.choice(available_cars))
         
-        if target_car:
-            target_car.inject_accident(duration)
+        if target is not None:
+            self.accident_active[target] = True
+            self.accident_start_time[target] = self.clock.time()
+            self.accident_duration[target] = duration
             return {
                 'status': 'accident_injected',
-                'car_id': target_car.id,
+                'car_id': self.car_ids[target],
                 'duration': duration
             }
         return {'status': 'failed', 'reason': 'no_cars_available'}
@@ -177,16 +177,12 @@ class TrafficSimulator:
         Manually clear accident
         """
         if car_id:
-            target_car = next((c for c in self.cars if c.id == car_id), None)
-            if target_car:
-                target_car.clear_accident()
+            target = self.car_index.get(car_id)
+            if target is not None:
+                self.accident_active[target] = False
                 return {'status': 'cleared', 'car_id': car_id}
         else:
             # Clear all
-            count = 0
-            for car in self.cars:
-                if car.accident_active:
-                    car.clear_accident()
-                    count += 1
+            count = int(self.accident_active.sum())
+            self.accident_active[:] = False
             return {'status': 'cleared_all', 'count': count}
-
@@ -0,0 +1,166 @@
+"""
+Delta encoding for traffic_update broadcasts
+Clients get a periodic keyframe with the full state and otherwise only
+the car fields and accidents that changed since the last broadcast
+"""
+
+import numpy as np
+from config import Config
+
+
+# Car fields sent to clients (the per-car timestamp is the payload timestamp)
+CAR_FIELDS = ('speed', 'predicted_speed', 'cusum_stat', 'sprt_ratio', 'ph_stat',
+              'accident_detected', 'accident_active', 'accident_id', 'confidence')
+
+
+class DeltaEncoder:
+    """
+    Builds traffic_update payloads against the last state sent to clients
+    Payload 'type' is 'keyframe' (full state) or 'delta' (changes only);
+    'seq' increases by one per payload so clients can detect gaps
+    
+    Car data is columnar: keyframes carry {'car_id': [...], field: [...]},
+    deltas carry {field: {car_id: value}} for changed values only
+    """
+    def __init__(self, keyframe_interval=None, thresholds=None):
+        self.keyframe_interval = keyframe_interval or Config.DELTA_KEYFRAME_INTERVAL
+        self.thresholds = thresholds if thresholds is not None else Config.DELTA_THRESHOLDS
+        self.seq = 0
+        self.ticks_since_keyframe = 0
+        self.force_keyframe = True
+        
+        # Last state sent to clients, row-aligned with sent_ids
+        self.sent_ids = []
+        self.sent_positions = {}
+        self.sent_columns = {}
+        self.sent_accident_ids = set()
+        self.sent_simulator_status = {}
+        
+    def request_keyframe(self):
+        """Send the full state on the next encode (e.g. a client connected)"""
+        self.force_keyframe = True
+        
+    def encode(self, timestamp, cars, active_accidents, user_report, simulator_status):
+        """
+        Build the next traffic_update payload
+        cars: DetectionBatch or list of detection result dicts
+        Returns: payload dict
+        """
+        self.seq += 1
+        car_ids, columns = _columns(cars)
+        if self.force_keyframe or self.ticks_since_keyframe + 1 >= self.keyframe_interval:
+            return self._keyframe(timestamp, car_ids, columns, active_accidents,
+                                  user_report, simulator_status)
+        self.ticks_since_keyframe += 1
+        
+        # Line up the sent state with this tick's rows
+        added = np.zeros(len(car_ids), dtype=bool)
+        removed_cars = []
+        if car_ids is not self.sent_ids and car_ids != self.sent_ids:
+            rows = np.fromiter((self.sent_positions.get(c, -1) for c in car_ids),
+                               dtype=np.intp, count=len(car_ids))
+            added = rows < 0
+            present = set(car_ids)
+            removed_cars = [c for c in self.sent_ids if c not in present]
+            for field, sent in self.sent_columns.items():
+                aligned = sent[np.maximum(rows, 0)] if len(sent) else columns[field].copy()
+                aligned[added] = columns[field][added]
+                self.sent_columns[field] = aligned
+            self.sent_positions = {c: i for i, c in enumerate(car_ids)}
+        self.sent_ids = car_ids
+        
+        # Cars: only values that moved beyond their threshold
+        changed_cars = {}
+        for field in CAR_FIELDS:
+            new = columns[field]
+            sent = self.sent_columns[field]
+            threshold = self.thresholds.get(field)
+            if threshold is not None:
+                changed = np.abs(new - sent) > threshold
+            else:
+                changed = new != sent
+            changed &= ~added
+            idx = np.flatnonzero(changed)
+            if len(idx):
+                sent[idx] = new[idx]
+                changed_cars[field] = dict(zip([car_ids[i] for i in idx.tolist()], new[idx].tolist()))
+        added_idx = np.flatnonzero(added)
+        added_cars = _select(car_ids, columns, added_idx) if len(added_idx) else None
+        
+        # Accidents: adds and removes by id
+        current_ids = {a['id'] for a in active_accidents}
+        accidents_added = [a for a in active_accidents if a['id'] not in self.sent_accident_ids]
+        accidents_removed = [i for i in self.sent_accident_ids if i not in current_ids]
+        self.sent_accident_ids = current_ids
+        
+        # Simulator status: changed entries only
+        status_changes = {k: v for k, v in simulator_status.items()
+                          if self.sent_simulator_status.get(k) != v}
+        status_removed = [k for k in self.sent_simulator_status if k not in simulator_status]
+        self.sent_simulator_status = dict(simulator_status)
+        
+        return {
+            'type': 'delta',
+            'seq': self.seq,
+            'timestamp': timestamp,
+            'cars': changed_cars,
+            'added_cars': added_cars,
+            'removed_cars': removed_cars,
+            'accidents_added': accidents_added,
+            'accidents_removed': accidents_removed,
+            'user_report': user_report,
+            'simulator_status': status_changes,
+            'simulator_status_removed': status_removed
+        }
+    
+    def _keyframe(self, timestamp, car_ids, columns, active_accidents, user_report, simulator_status):
+        """Full state payload; resets the sent-state baseline"""
+        self.force_keyframe = False
+        self.ticks_since_keyframe = 0
+        self.sent_ids = car_ids
+        self.sent_positions = {c: i for i, c in enumerate(car_ids)}
+        self.sent_columns = {field: column.copy() for field, column in columns.items()}
+        self.sent_accident_ids = {a['id'] for a in active_accidents}
+        self.sent_simulator_status = dict(simulator_status)
+        return {
+            'type': 'keyframe',
+            'seq': self.seq,
+            'timestamp': timestamp,
+            'cars': _select(car_ids, columns),
+            'active_accidents': active_accidents,
+            'user_report': user_report,
+            'simulator_status': simulator_status
+        }
+
+
+def _columns(cars):
+    """
+    Car ids and field arrays from a DetectionBatch or list of result dicts
+    Returns: (car_ids list, dict of field -> NumPy array)
+    """
+    if isinstance(cars, list):
+        car_ids = [car['car_id'] for car in cars]
+        raw = {field: [car[field] for car in cars] for field in CAR_FIELDS}
+    else:
+        car_ids = cars.car_ids
+        raw = {field: getattr(cars, field) for field in CAR_FIELDS}
+    columns = {}
+    for field, values in raw.items():
+        if field == 'accident_id':
+            column = np.empty(len(car_ids), dtype=object)
+            column[:] = values
+        else:
+            column = np.asarray(values)
+        columns[field] = column
+    return car_ids, columns
+
+
+def _select(car_ids, columns, idx=None):
+    """Columnar JSON-ready car data for all rows or the given rows"""
+    if idx is None:
+        selected = {'car_id': list(car_ids)}
+        selected.update({field: column.tolist() for field, column in columns.items()})
+    else:
+        selected = {'car_id': [car_ids[i] for i in idx.tolist()]}
+        selected.update({field: column[idx].tolist() for field, column in columns.items()})
+    return selected
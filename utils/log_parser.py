@@ -0,0 +1,394 @@
+"""
+Vectorized parser for passage and report logs
+Memory-maps a log, extracts its columns in bulk and keeps a binary columnar
+cache (.npz) so later loads of an unchanged file skip parsing entirely
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import numpy as np
+
+from config import Config
+
+
+# Reference grammar for one line (used for lines the bulk path cannot handle):
+# '<timestamp> CarN passed <point> at <speed> mph' or '<timestamp> CarN filed ... report'
+# where timestamp is '2025-09-27 08:00:08.577194' or '2025-09-27T10:00:00'
+LINE_PATTERN = re.compile(
+    rb"^(\d{4}-\d\d-\d\d[ T][\d:.]+) Car(\d+) "
+    rb"(?:passed (\w+) at (\d+(?:\.\d+)?) mph|filed .*report)[ \t\r]*$")
+
+# Bytes parsed per pass (chunks end on a line boundary)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Widest line the bulk decoder handles; longer lines are left to LINE_PATTERN
+BLOCK_WIDTH = 64
+
+# Bump when the column layout changes so old caches are ignored
+CACHE_VERSION = 1
+
+SPACE, DOT, ZERO = ord(' '), ord('.'), ord('0')
+
+
+class LogColumns:
+    """
+    Parsed log as parallel arrays, in file order
+    timestamp: datetime64[us] (naive, as written in the log)
+    car: int64 car number (Car348 -> 348)
+    point: int16 index into points, -1 for report lines
+    speed: float64 mph, NaN for report lines
+    """
+    def __init__(self, timestamp, car, point, speed, points):
+        self.timestamp = timestamp
+        self.car = car
+        self.point = point
+        self.speed = speed
+        self.points = points
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def is_report(self):
+        return self.point < 0
+
+    def point_code(self, name):
+        """Index of a checkpoint name in points, or -1 if the log never mentions it"""
+        return self.points.index(name) if name in self.points else -1
+
+    def seconds(self):
+        """Timestamps as float seconds since the epoch (log times read as UTC)"""
+        return self.timestamp.astype(np.int64) / 1e6
+
+    def car_ids(self):
+        """Car numbers as 'CarN' strings"""
+        return np.char.add('Car', self.car.astype(str))
+
+
+def load_log(path, cache=True, cache_dir=None):
+    """
+    Parse a passage or report log into LogColumns
+    cache: reuse / write a columnar cache keyed by the file's absolute path, size and mtime
+    """
+    stat = os.stat(path)
+    cache_path = _cache_path(path, stat, cache_dir) if cache else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            return _read_cache(cache_path)
+        except (OSError, KeyError, ValueError):
+            pass  # unreadable cache: parse again and overwrite it
+
+    columns = parse_log(path)
+    if cache_path:
+        _write_cache(cache_path, columns)
+    return columns
+
+
+def parse_log(path):
+    """Parse a log without touching the cache"""
+    parts = []
+    points = []
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _empty(points)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in _chunks(data):
+                parts.append(_parse_chunk(data[start:end], points))
+    if not parts:
+        return _empty(points)
+    return LogColumns(*(np.concatenate(column) for column in zip(*parts)), points=points)
+
+
+def _chunks(data):
+    """(start, end) byte ranges of about CHUNK_SIZE, each ending after a newline"""
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + CHUNK_SIZE, size)
+        if end < size:
+            # Extend to the end of the line the chunk stopped in
+            newline = data.find(b'\n', end - 1)
+            end = newline + 1 if newline >= 0 else size
+        yield start, end
+        start = end
+
+
+def _parse_chunk(chunk, points):
+    """
+    Columns for one chunk; points (checkpoint names) is extended in place
+    Lines are copied into a fixed-width byte block and grouped by layout
+    (where their spaces fall and where they end). Within a layout every field
+    sits in the same columns, so it is decoded column by column for all of
+    its lines at once; lines no layout explains go through LINE_PATTERN
+    """
+    raw = np.frombuffer(chunk, dtype=np.uint8)
+    if not len(raw):
+        return _empty_arrays()
+    newlines = np.flatnonzero(raw == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(raw)]))
+    ends -= (ends > starts) & (raw[np.maximum(ends - 1, 0)] == ord('\r'))
+    keep = ends > starts  # skip blank lines
+    starts, ends = starts[keep], ends[keep]
+    n = len(starts)
+    if not n:
+        return _empty_arrays()
+    lengths = ends - starts
+
+    # Fixed-width copy of every line (bytes past a line's end belong to the next)
+    raw = np.concatenate((raw, np.zeros(BLOCK_WIDTH, dtype=np.uint8)))
+    block = np.lib.stride_tricks.sliding_window_view(raw, BLOCK_WIDTH)[starts]
+    ok = (lengths >= 19) & (lengths <= BLOCK_WIDTH)
+
+    # Date and whole seconds sit at fixed columns in every layout
+    ok &= _literal(block, 4, b'-') & _literal(block, 7, b'-')
+    ok &= _literal(block, 13, b':') & _literal(block, 16, b':')
+    ok &= _literal(block, 10, b' ') | _literal(block, 10, b'T')
+    year, valid = _decode_uint(block, 0, 4)
+    ok &= valid
+    month_day_time = []
+    for col in (5, 8, 11, 14, 17):
+        value, valid = _decode_uint(block, col, col + 2)
+        ok &= valid
+        month_day_time.append(value)
+    month, day, hour, minute, second = month_day_time
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    ok &= (hour < 24) & (minute < 60) & (second < 60)
+
+    # Layout key: one bit per column that holds a space, plus the line's last column
+    keys = np.packbits(block == SPACE, axis=1, bitorder='little').view(np.uint64).ravel()
+    last = np.minimum(lengths, BLOCK_WIDTH) - 1
+    one = np.uint64(1)
+    keys &= (one << last.astype(np.uint64)) - one
+    keys |= one << last.astype(np.uint64)
+    keys = np.where(ok, keys, 0)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    bounds = np.concatenate(([0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1, [n]))
+
+    micros = np.zeros(n, dtype=np.int64)
+    car = np.zeros(n, dtype=np.int64)
+    point = np.full(n, -1, dtype=np.int16)
+    speed = np.full(n, np.nan)
+    for begin, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        key = int(sorted_keys[begin])
+        rows = order[begin:end]
+        if not key:
+            continue  # lines that already failed
+        columns = [col for col in range(BLOCK_WIDTH) if key >> col & 1]
+        fields = _decode_layout(block[rows], columns, points)
+        if fields is None:
+            ok[rows] = False
+            continue
+        valid, micros[rows], car[rows], point[rows], speed[rows] = fields
+        ok[rows] &= valid
+
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + np.where(ok, day - 1, 0).astype('timedelta64[D]')
+    ok &= dates.astype('datetime64[M]') == months  # rejects e.g. Feb 30
+    timestamp = (dates.astype('datetime64[us]')
+                 + ((hour * 60 + minute) * 60 + second).astype('timedelta64[s]')
+                 + micros.astype('timedelta64[us]'))
+
+    return _fallback(chunk, starts, ends, ok, (timestamp, car, point, speed), points)
+
+
+def _decode_layout(lines, columns, points):
+    """
+    Decode lines sharing one layout
+    columns: space columns plus the last column of the line
+    Returns: (ok, micros, car, point, speed) arrays, or None if the layout
+    matches neither line format
+    """
+    spaces, length = columns[:-1], columns[-1] + 1
+    if spaces and spaces[0] == 10:
+        spaces = spaces[1:]  # '2025-09-27 08:00:08': skip the date/time separator
+    if not spaces:
+        return None
+    time_end = spaces[0]
+    # Tokens after the timestamp as (start, end) columns
+    tokens = list(zip([col + 1 for col in spaces], spaces[1:] + [length]))
+    n = len(lines)
+
+    # Fraction of a second
+    frac_len = time_end - 20
+    if time_end == 19:
+        ok = np.ones(n, dtype=bool)
+        micros = np.zeros(n, dtype=np.int64)
+    elif 1 <= frac_len <= 6:
+        ok = _literal(lines, 19, b'.')
+        micros, valid = _decode_uint(lines, 20, time_end)
+        micros *= 10 ** (6 - frac_len)
+        ok &= valid
+    else:
+        return None
+
+    # 'CarN'
+    if len(tokens) < 3 or tokens[0][1] - tokens[0][0] < 4:
+        return None
+    car_start, car_end = tokens[0]
+    ok &= _literal(lines, car_start, b'Car')
+    car, valid = _decode_uint(lines, car_start + 3, car_end)
+    ok &= valid
+
+    def is_word(token, word):
+        start, end = token
+        if end - start != len(word):
+            return np.zeros(n, dtype=bool)
+        return _literal(lines, start, word)
+
+    if len(tokens) == 6 and tokens[1][1] - tokens[1][0] == 6:
+        # 'passed <point> at <speed> mph'
+        ok &= is_word(tokens[1], b'passed') & is_word(tokens[3], b'at') & is_word(tokens[5], b'mph')
+        speed, valid = _decode_decimal(lines, *tokens[4])
+        ok &= valid
+        point, valid = _point_codes(lines, *tokens[2], points)
+        ok &= valid
+    else:
+        # 'filed ... report'
+        ok &= is_word(tokens[1], b'filed') & is_word(tokens[-1], b'report')
+        speed = np.full(n, np.nan)
+        point = np.full(n, -1, dtype=np.int16)
+    return ok, micros, car, point, speed
+
+
+def _literal(lines, start, word):
+    """Lines with word at columns [start, start + len(word))"""
+    match = lines[:, start] == word[0]
+    for k in range(1, len(word)):
+        match &= lines[:, start + k] == word[k]
+    return match
+
+
+def _decode_uint(lines, start, end):
+    """Unsigned integers in columns [start, end); returns (values, ok)"""
+    values = np.zeros(len(lines), dtype=np.int64)
+    ok = np.full(len(lines), end - start <= 18)
+    for col in range(start, end):
+        digit = lines[:, col] - np.uint8(ZERO)  # non-digits wrap to >= 10
+        ok &= digit < 10
+        values = values * 10 + digit
+    return values, ok
+
+
+def _decode_decimal(lines, start, end):
+    """Non-negative decimals like '12' or '0.5' in columns [start, end); returns (values, ok)"""
+    n = len(lines)
+    mantissa = np.zeros(n, dtype=np.int64)
+    decimals = np.zeros(n, dtype=np.int64)
+    seen_dot = np.zeros(n, dtype=bool)
+    ok = np.full(n, 0 < end - start <= 18)
+    for col in range(start, end):
+        char = lines[:, col]
+        is_dot = char == DOT
+        digit = char - np.uint8(ZERO)
+        is_digit = digit < 10
+        ok &= is_digit | (is_dot & ~seen_dot)
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        decimals += is_digit & seen_dot
+        seen_dot |= is_dot
+    # A dot needs digits on both sides
+    ok &= (lines[:, start] != DOT) & (lines[:, end - 1] != DOT)
+    return mantissa / 10.0 ** decimals, ok
+
+
+def _point_codes(lines, start, end, points):
+    """
+    Checkpoint names in columns [start, end) as int16 indexes into points
+    Names of up to 8 bytes are compared as packed integers
+    """
+    n = len(lines)
+    if not 0 < end - start <= 8:
+        return np.full(n, -1, dtype=np.int16), np.zeros(n, dtype=bool)
+    keys = np.zeros(n, dtype=np.uint64)
+    for col in range(start, end):
+        keys = (keys << np.uint64(8)) | lines[:, col]
+    codes = np.full(n, -1, dtype=np.int16)
+    unassigned = np.ones(n, dtype=bool)
+    # Few distinct checkpoints per log: one pass per name
+    while unassigned.any():
+        row = int(unassigned.argmax())
+        name = bytes(lines[row, start:end]).decode(errors='replace')
+        if name not in points:
+            points.append(name)
+        same = keys == keys[row]
+        codes[same] = points.index(name)
+        unassigned &= ~same
+    return codes, np.ones(n, dtype=bool)
+
+
+def _fallback(chunk, starts, ends, ok, columns, points):
+    """
+    Re-parse the rows the bulk decoder rejected with LINE_PATTERN
+    Rows that do not match it either are dropped
+    """
+    bad = np.flatnonzero(~ok)
+    if not len(bad):
+        return columns
+    timestamp, car, point, speed = columns
+    keep = ok.copy()
+    for row in bad.tolist():
+        m = LINE_PATTERN.match(chunk[starts[row]:ends[row]])
+        if not m:
+            continue
+        ts, number, name, value = m.groups()
+        try:
+            timestamp[row] = np.datetime64(ts.decode().replace(' ', 'T'), 'us')
+        except ValueError:
+            continue
+        car[row] = int(number)
+        if name is None:
+            point[row], speed[row] = -1, np.nan
+        else:
+            name = name.decode()
+            if name not in points:
+                points.append(name)
+            point[row], speed[row] = points.index(name), float(value)
+        keep[row] = True
+    return timestamp[keep], car[keep], point[keep], speed[keep]
+
+
+def _empty_arrays():
+    return (np.array([], dtype='datetime64[us]'), np.array([], dtype=np.int64),
+            np.array([], dtype=np.int16), np.array([], dtype=np.float64))
+
+
+def _empty(points):
+    return LogColumns(*_empty_arrays(), points=points)
+
+
+def _cache_path(path, stat, cache_dir=None):
+    cache_dir = cache_dir or Config.LOG_CACHE_DIR
+    # Same-named logs in different directories get their own caches
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    name = f"{os.path.basename(path)}.{digest}"
+    return os.path.join(cache_dir, f"{name}.{stat.st_size}.{stat.st_mtime_ns}.v{CACHE_VERSION}.npz")
+
+
+def _read_cache(cache_path):
+    with np.load(cache_path, allow_pickle=False) as data:
+        return LogColumns(data['timestamp'], data['car'], data['point'], data['speed'],
+                          points=data['points'].tolist())
+
+
+def _write_cache(cache_path, columns):
+    cache_dir, cache_name = os.path.split(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    # Drop caches for earlier sizes/mtimes of the same file
+    log_name = cache_name.rsplit('.', 4)[0]
+    stale = re.compile(re.escape(log_name) + r"\.\d+\.\d+\.v\d+\.npz$")
+    for old in os.listdir(cache_dir):
+        if old != cache_name and stale.match(old):
+            try:
+                os.remove(os.path.join(cache_dir, old))
+            except OSError:
+                pass
+    
+    # Write then rename so readers never see a partial cache
+    tmp = cache_path[:-len('.npz')] + '.tmp.npz'
+    np.savez(tmp, timestamp=columns.timestamp, car=columns.car, point=columns.point,
+             speed=columns.speed, points=np.array(columns.points, dtype=str))
+    os.replace(tmp, cache_path)
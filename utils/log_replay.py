@@ -0,0 +1,315 @@
+"""
+Offline replay of passage and report logs through AccidentDetector
+Streams car_log.txt / followup_log.txt style passage logs and report_log.txt
+style report logs line by line, merges them in time order, turns
+PointA -> PointB passages into speed observations, groups them into ticks
+(one observation per key per tick, like the live stream) and feeds them to
+the detector in columnar batches as fast as the CPU allows (or, in
+travel_time mode, feeds every passage to the per-segment SegmentDetector)
+
+Usage: python -m utils.log_replay car_log.txt --reports report_log.txt [--mode segment]
+"""
+
+import argparse
+import heapq
+import json
+import re
+import time
+import warnings
+import numpy as np
+from datetime import datetime, timezone
+
+from config import Config
+from models.segment_detector import SegmentDetector
+from models.sequential_estimators import AccidentDetector
+from utils.speed_batch import SpeedBatch
+from utils.travel_times import TravelTimeJoin
+
+
+# "<timestamp> <car> passed <point> at <speed> mph" / "<timestamp> <car> filed ... report"
+# timestamps are ISO with either a space or a 'T' between date and time, read as
+# UTC (like utils.log_parser) so results do not depend on the machine's time zone
+LINE_PATTERN = re.compile(
+    r"^(\d{4}-\d\d-\d\d[ T][\d:.]+) (\S+) "
+    r"(?:passed (\w+) at (\d+(?:\.\d+)?) mph|filed (.*?)report)\s*$")
+
+# The one segment the shipped logs describe (return passages B -> A are not trips)
+SEGMENTS = [(Config.SEGMENT_ENTRY, Config.SEGMENT_EXIT)]
+
+# Event kinds
+PASSAGE = 'passage'
+REPORT = 'report'
+
+
+def parse_line(line):
+    """
+    Parse one log line
+    Returns: (epoch seconds, kind, car_id, point, speed) or None for unrecognized lines
+    """
+    m = LINE_PATTERN.match(line)
+    if not m:
+        return None
+    ts, car_id, point, speed, report = m.groups()
+    try:
+        epoch = datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+    if point is not None:
+        return (epoch, PASSAGE, car_id, point, float(speed))
+    return (epoch, REPORT, car_id, report.strip() or None, np.nan)
+
+
+def read_events(path, stats=None):
+    """
+    Stream parsed events from a log file without loading it
+    stats: optional dict; 'lines' and 'skipped' counters are incremented
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            event = parse_line(line)
+            if stats is not None:
+                stats['lines'] += 1
+            if event is None:
+                if stats is not None:
+                    stats['skipped'] += 1
+                continue
+            yield event
+
+
+def reorder(events, max_delay, stats=None):
+    """
+    Restore time order for streams that are only roughly sorted
+    Events are held in a heap until max_delay seconds of newer data have been
+    seen, so memory is bounded by the events within one max_delay window.
+    Events later than that are passed through immediately and counted in
+    stats['late']
+    """
+    heap = []
+    newest = -np.inf
+    emitted = -np.inf
+    seq = 0
+    for event in events:
+        ts = event[0]
+        if ts < emitted:
+            if stats is not None:
+                stats['late'] += 1
+            yield event
+            continue
+        heapq.heappush(heap, (ts, seq, event))
+        seq += 1
+        if ts > newest:
+            newest = ts
+        while heap and heap[0][0] <= newest - max_delay:
+            emitted, _, ready = heapq.heappop(heap)
+            yield ready
+    while heap:
+        emitted, _, ready = heapq.heappop(heap)
+        yield ready
+
+
+class LogReplay:
+    """
+    Replays passage and report logs through an AccidentDetector
+    mode 'segment': one observation per tick for the segment, with
+        speed = segment length / mean travel time of the trips completed in
+        the tick (the default length reads a normal trip as NORMAL_SPEED_MEAN)
+    mode 'car': the logged point speeds, keyed by car (mean per tick)
+    mode 'travel_time': passages go straight to a SegmentDetector (the
+        detector argument), which runs CUSUM/SPRT on each segment's travel time
+    """
+    MODES = ('segment', 'car', 'travel_time')
+
+    def __init__(self, detector=None, mode='segment', segment_length=None, tick=None, batch_size=None,
+                 max_delay=None, join=None, on_event=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown replay mode '{mode}', expected one of {list(self.MODES)}")
+        if detector is None:
+            detector = SegmentDetector(SEGMENTS) if mode == 'travel_time' else AccidentDetector()
+        self.detector = detector
+        self.mode = mode
+        self.segment_length = segment_length or Config.REPLAY_SEGMENT_LENGTH
+        self.tick = tick or Config.REPLAY_TICK
+        self.batch_size = batch_size or Config.REPLAY_BATCH_SIZE
+        self.max_delay = max_delay if max_delay is not None else Config.REPLAY_MAX_DELAY
+        # Called with each detection / clearance / report dict, in time order
+        self.on_event = on_event
+
+        # Entry/exit passage join (bounded pending entries with a timeout)
+        self.join = join if join is not None else TravelTimeJoin()
+        self.segment = f"{self.join.entry}-{self.join.exit}"
+        self.active = set()  # observation keys with an active accident
+        self._tick_end = None  # end of the open tick
+        self._tick_values = {}  # key -> [sum, count, last timestamp] within the open tick
+        self._rows = []
+
+    def replay(self, passage_logs, report_logs=()):
+        """
+        Replay log files (paths) to the end
+        Returns: summary dict with counts and throughput
+        """
+        stats = {'lines': 0, 'skipped': 0, 'late': 0, 'passages': 0, 'reports': 0, 'trips': 0,
+                 'observations': 0, 'detections': 0, 'clearances': 0}
+        streams = [reorder(read_events(path, stats), self.max_delay, stats)
+                   for path in [*passage_logs, *report_logs]]
+
+        start = time.perf_counter()
+        for event in heapq.merge(*streams, key=lambda e: e[0]):
+            if event[1] == PASSAGE:
+                stats['passages'] += 1
+                self._passage(event, stats)
+            else:
+                stats['reports'] += 1
+                # Keep the timeline ordered: detections up to the last closed tick come first
+                self._close_ticks(event[0], stats)
+                self._flush(stats)
+                self._emit({'type': 'report', 'timestamp': _iso(event[0]), 'car_id': event[2]})
+        self._close_tick(stats)
+        self._flush(stats)
+        elapsed = time.perf_counter() - start
+
+        if self.mode == 'segment':
+            stats.update(self.join.stats)
+            stats['unmatched'] = len(self.join.pending)
+        elif self.mode == 'travel_time':
+            stats.update(self.detector.join.stats)
+            stats['segments'] = len(self.detector.states)
+        stats['elapsed_s'] = elapsed
+        stats['events_per_s'] = (stats['passages'] + stats['reports']) / elapsed if elapsed else None
+        stats['active_accidents'] = sorted(self.active)
+        return stats
+
+    def _passage(self, event, stats):
+        ts, _, car_id, point, speed = event
+        if self.mode == 'travel_time':
+            self._trip(self.detector.update(ts, car_id, point), stats)
+            return
+        if self.mode == 'car':
+            self._observe(car_id, ts, speed, stats)
+            return
+
+        # Segment trips are averaged as travel times, converted to a speed when the tick closes
+        entered = self.join.add(ts, car_id, point)
+        if entered is not None and ts > entered:
+            stats['trips'] += 1
+            self._observe(self.segment, ts, ts - entered, stats)
+
+    def _trip(self, result, stats):
+        """Track accident onsets / clearances of one SegmentDetector result"""
+        if result is None:
+            return
+        stats['observations'] += 1
+        segment = result['segment']
+        if result['accident_active'] and segment not in self.active:
+            self.active.add(segment)
+            stats['detections'] += 1
+            self._emit({'type': 'detection', 'timestamp': _iso(result['timestamp']), 'car_id': segment,
+                        'accident_id': result['accident_id'], 'travel_time': result['travel_time'],
+                        'baseline': result['baseline']})
+        elif result['accident_cleared']:
+            self.active.discard(segment)
+            stats['clearances'] += 1
+            self._emit({'type': 'cleared', 'timestamp': _iso(result['timestamp']), 'car_id': segment})
+
+    def _observe(self, key, ts, value, stats):
+        """Add a value to the open tick, closing earlier ticks first"""
+        self._close_ticks(ts, stats)
+        if self._tick_end is None:
+            self._tick_end = ts + self.tick
+        acc = self._tick_values.get(key)
+        if acc is None:
+            self._tick_values[key] = [value, 1, ts]
+        else:
+            acc[0] += value
+            acc[1] += 1
+            acc[2] = max(acc[2], ts)
+
+    def _close_ticks(self, ts, stats):
+        """Close the open tick if ts is past its end"""
+        if self._tick_end is not None and ts >= self._tick_end:
+            self._close_tick(stats)
+
+    def _close_tick(self, stats):
+        """Turn the open tick into one detector row per key"""
+        for key, (total, count, ts) in self._tick_values.items():
+            mean = total / count
+            speed = self.segment_length * 3600.0 / mean if self.mode == 'segment' else mean
+            self._rows.append((key, ts, speed))
+        self._tick_values = {}
+        self._tick_end = None
+        if len(self._rows) >= self.batch_size:
+            self._flush(stats)
+
+    def _flush(self, stats):
+        """Run buffered observations through the detector"""
+        if not self._rows:
+            return
+        keys, times, speeds = zip(*self._rows)
+        self._rows = []
+        keys = list(keys)
+        batch = SpeedBatch(keys, speeds, [_iso(ts) for ts in times], timestamp=times)
+        results = self.detector.process_batch(batch)
+        stats['observations'] += len(batch)
+
+        # Only rows of keys that are active before or within the batch can change state
+        active_keys = self.active | {keys[i] for i in np.flatnonzero(results.accident_active).tolist()}
+        rows = [i for i, key in enumerate(keys) if key in active_keys] if active_keys else []
+        for i in rows:
+            key = keys[i]
+            if results.accident_active[i] and key not in self.active:
+                self.active.add(key)
+                stats['detections'] += 1
+                self._emit({'type': 'detection', 'timestamp': batch.timestamp_iso[i], 'car_id': key,
+                            'accident_id': results.accident_id[i], 'speed': float(batch.speed[i])})
+            elif not results.accident_active[i] and key in self.active:
+                self.active.discard(key)
+                stats['clearances'] += 1
+                self._emit({'type': 'cleared', 'timestamp': batch.timestamp_iso[i], 'car_id': key})
+
+    def _emit(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+
+def _iso(epoch):
+    """Naive ISO timestamp in log time (UTC)"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('logs', nargs='+', help='passage logs (car_log.txt, followup_log.txt)')
+    parser.add_argument('--reports', nargs='*', default=[], help='report logs (report_log.txt)')
+    parser.add_argument('--mode', choices=LogReplay.MODES, default='segment')
+    parser.add_argument('--predictor', default=None)
+    parser.add_argument('--events', action='store_true', help='print the detection/report timeline')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')  # statsmodels convergence chatter
+    on_event = (lambda e: print(json.dumps(e))) if args.events else None
+    if args.mode == 'travel_time':
+        detector = SegmentDetector(SEGMENTS)
+    else:
+        detector = AccidentDetector(predictor=args.predictor)
+    replay = LogReplay(detector, args.mode, on_event=on_event)
+    summary = replay.replay(args.logs, args.reports)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['lines']} lines ({summary['skipped']} skipped, {summary['late']} late), "
+          f"{summary['passages']} passages, {summary['reports']} reports")
+    if args.mode == 'segment':
+        print(f"{summary['trips']} trips in {summary['observations']} ticks, {summary['unmatched']} unmatched, "
+              f"{summary['expired'] + summary['evicted']} expired, {summary['orphan_exits']} orphan exits")
+    elif args.mode == 'travel_time':
+        print(f"{summary['observations']} trips on {summary['segments']} segments, "
+              f"{summary['expired'] + summary['evicted']} expired")
+    else:
+        print(f"{summary['observations']} observations")
+    print(f"{summary['detections']} detections, {summary['clearances']} clearances")
+    print(f"{summary['elapsed_s']:.3f}s, {summary['events_per_s']:.0f} events/s")
+
+
+if __name__ == '__main__':
+    main()
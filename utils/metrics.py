@@ -0,0 +1,169 @@
+"""
+In-process metrics for Traffic Accident Detection System
+Histograms and gauges kept in plain Python structures and rendered in the
+Prometheus text format by GET /metrics. Stage timers take one perf_counter()
+reading per stage; with Config.METRICS_ENABLED off they are a shared no-op
+object and the socket JSON hook is never installed, so nothing is recorded
+"""
+
+import json
+import time
+from bisect import bisect_left
+
+from config import Config
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+# Help text per metric name
+HELP = {
+    'traffic_tick_seconds': 'Stream worker tick duration',
+    'traffic_tick_stage_seconds': 'Stream worker time per tick stage',
+    'traffic_detector_stage_seconds': 'AccidentDetector time per batch stage',
+    'traffic_json_encode_seconds': 'Socket.IO packet JSON encoding time per event',
+    'traffic_emit_bytes': 'Socket.IO packet size per event',
+    'traffic_cars': 'Simulated cars',
+    'traffic_detector_cars': 'Cars with detector state',
+    'traffic_active_accidents': 'Accidents currently registered',
+    'traffic_accidents_cleared': 'Accidents cleared since this process started',
+    'traffic_tick_overruns': 'Ticks that overran their deadline',
+    'traffic_tick_utilization': 'Mean tick work time as a share of the tick interval',
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative only when rendered)"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StageTimer:
+    """
+    Laps through the stages of one tick or batch
+    lap(stage) records the time since the previous lap (or creation) under
+    label stage; total(name) records the time since creation
+    """
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(self.name, now - self.last, stage=stage)
+        self.last = now
+
+    def total(self, name):
+        self.metrics.observe(name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    """Stand-in timer while metrics are disabled"""
+    def lap(self, stage):
+        pass
+
+    def total(self, name):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Registry of histograms and gauges keyed by (name, sorted labels)
+    """
+    def __init__(self, enabled=None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.histograms = {}
+        self.gauges = {}
+
+    def timer(self, name):
+        """StageTimer for histogram `name`, or a no-op timer when disabled"""
+        return StageTimer(self, name) if self.enabled else NULL_TIMER
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def json_module(self):
+        """
+        json stand-in for SocketIO(json=...): times every packet encoding and
+        records its size, labelled by event name
+        """
+        registry = self
+
+        class MeteredJSON:
+            @staticmethod
+            def dumps(obj, *args, **kwargs):
+                start = time.perf_counter()
+                text = json.dumps(obj, *args, **kwargs)
+                event = obj[0] if isinstance(obj, list) and obj and isinstance(obj[0], str) else ''
+                registry.observe('traffic_json_encode_seconds', time.perf_counter() - start, event=event)
+                registry.observe('traffic_emit_bytes', len(text), SIZE_BUCKETS, event=event)
+                return text
+
+            loads = staticmethod(json.loads)
+
+        return MeteredJSON
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.gauges.items()):
+            header(name, 'gauge')
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return repr(float(value))
+
+
+# Process-wide registry
+metrics = Metrics()
@@ -0,0 +1,211 @@
+"""
+Streaming NDJSON ingestion of speed observations
+Reads a request body in chunks (optionally gzip-compressed), splits it into
+lines without holding the whole body, and turns every batch_size lines into
+a columnar SpeedBatch. Malformed records are counted and reported (line
+number and reason) instead of failing the batch
+
+One record per line, in the simulator's speed data format:
+    {"car_id": "car_7", "speed": 57.2, "timestamp": "2024-01-01T12:00:00",
+     "location": {"lat": 37.77, "lon": -122.42}}
+timestamp may also be epoch seconds; location (or flat lat/lon) is optional
+"""
+
+import json
+import zlib
+import numpy as np
+from datetime import datetime
+
+from config import Config
+from utils.speed_batch import SpeedBatch, _epochs
+
+# zlib window bits for gzip framing
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Latest epoch second datetime can represent (9999-12-31T23:59:59 UTC)
+MAX_EPOCH = 253402300799.0
+
+
+class NDJSONReader:
+    """
+    Incremental NDJSON -> SpeedBatch reader for one request body
+    Counters (lines, accepted, rejected) and the first max_rejects rejects
+    accumulate while batches() is consumed
+    """
+    def __init__(self, batch_size=None, chunk_size=None, max_line=None, max_rejects=None):
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.chunk_size = chunk_size or Config.INGEST_CHUNK_SIZE
+        self.max_line = max_line or Config.INGEST_MAX_LINE_BYTES
+        self.max_rejects = max_rejects if max_rejects is not None else Config.INGEST_MAX_REJECTS_REPORTED
+        self.lines = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = []  # [{'line': n, 'error': reason}], first max_rejects only
+
+    def batches(self, stream, gzip=False):
+        """
+        Parse a file-like body (anything with read(n))
+        gzip: body is gzip-compressed (concatenated members are fine)
+        Yields: SpeedBatch of up to batch_size accepted records
+        Raises: ValueError for a corrupt or truncated gzip body (batches
+            already yielded stay processed)
+        """
+        chunks = _read(stream, self.chunk_size)
+        if gzip:
+            chunks = _inflate(chunks, self.chunk_size)
+        columns = ([], [], [], [], [], [])  # car_id, speed, timestamp, lat, lon, line number
+        car_ids, speeds, stamps, lats, lons, line_nos = columns
+
+        for line_no, line in self._lines(chunks):
+            if line is None:
+                self._reject(line_no, f'line longer than {self.max_line} bytes')
+                continue
+            try:
+                record = json.loads(line)
+                car_id = record['car_id']
+                speed = float(record['speed'])
+                timestamp = record['timestamp']
+                location = record.get('location') or record
+                lat = float(location.get('lat', np.nan))
+                lon = float(location.get('lon', np.nan))
+            except KeyError as e:
+                self._reject(line_no, f'missing {e}')
+                continue
+            except (ValueError, TypeError, AttributeError) as e:
+                self._reject(line_no, f'invalid record: {e}')
+                continue
+            if not isinstance(car_id, (str, int)) or isinstance(car_id, bool):
+                self._reject(line_no, "invalid car_id")
+                continue
+            if not isinstance(timestamp, (str, int, float)) or isinstance(timestamp, bool):
+                self._reject(line_no, "invalid timestamp")
+                continue
+            car_ids.append(car_id if isinstance(car_id, str) else str(car_id))
+            speeds.append(speed)
+            stamps.append(timestamp)
+            lats.append(lat)
+            lons.append(lon)
+            line_nos.append(line_no)
+
+            if len(car_ids) >= self.batch_size:
+                batch = self._batch(*columns)
+                for column in columns:
+                    column.clear()
+                if batch is not None:
+                    yield batch
+
+        if car_ids:
+            batch = self._batch(*columns)
+            if batch is not None:
+                yield batch
+
+    def summary(self):
+        """Counters and reported rejects as a JSON-ready dict"""
+        return {
+            'lines': self.lines,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'rejects': sorted(self.rejects, key=lambda r: r['line']),
+            'rejects_truncated': self.rejected > len(self.rejects),
+        }
+
+    def _batch(self, car_ids, speeds, stamps, lats, lons, line_nos):
+        """Validate the value columns at once and build a SpeedBatch of the good rows"""
+        speed = np.array(speeds, dtype=float)
+        timestamp = _epochs(stamps)
+        # Out-of-range epochs would overflow datetime.fromtimestamp below and sink the batch
+        bad_time = ~np.isfinite(timestamp) | (timestamp < 0) | (timestamp > MAX_EPOCH)
+        bad = bad_time | ~np.isfinite(speed) | (speed < 0)
+        keep = None
+        if bad.any():
+            for i in np.flatnonzero(bad).tolist():
+                self._reject(line_nos[i], 'invalid timestamp' if bad_time[i] else 'invalid speed')
+            keep = np.flatnonzero(~bad)
+            if not len(keep):
+                return None
+            car_ids = [car_ids[i] for i in keep.tolist()]
+            stamps = [stamps[i] for i in keep.tolist()]
+            speed, timestamp = speed[keep], timestamp[keep]
+
+        # Epoch-second timestamps still need their ISO form for results and payloads
+        iso = {}
+        timestamp_iso = [ts if isinstance(ts, str) else
+                         iso.get(ts) or iso.setdefault(ts, datetime.fromtimestamp(ts).isoformat())
+                         for ts in stamps]
+        lat, lon = np.array(lats), np.array(lons)
+        if keep is not None:
+            lat, lon = lat[keep], lon[keep]
+        self.accepted += len(car_ids)
+        return SpeedBatch(list(car_ids), speed, timestamp_iso, timestamp=timestamp, lat=lat, lon=lon)
+
+    def _lines(self, chunks):
+        """
+        Split chunks into (line number, bytes) for non-blank lines
+        Lines over max_line bytes are dropped as they stream past and
+        yielded as (line number, None)
+        """
+        max_line = self.max_line
+        carry = b''
+        overflow = False
+        for chunk in chunks:
+            parts = chunk.split(b'\n')
+            if len(parts) == 1:
+                if not overflow:
+                    carry += chunk
+                    if len(carry) > max_line:
+                        carry, overflow = b'', True
+                continue
+
+            first = None if overflow else carry + parts[0]
+            parts[0] = first
+            carry = parts.pop()
+            overflow = False
+            for line in parts:
+                self.lines += 1
+                if line is None or len(line) > max_line:
+                    yield self.lines, None
+                elif line.strip():
+                    yield self.lines, line
+            if len(carry) > max_line:
+                carry, overflow = b'', True
+
+        if overflow or carry.strip():
+            self.lines += 1
+            yield self.lines, None if overflow else carry
+
+    def _reject(self, line_no, error):
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({'line': line_no, 'error': error})
+
+
+def _read(stream, chunk_size):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _inflate(chunks, chunk_size):
+    """Decompress gzip chunks incrementally, at most chunk_size bytes of output per step"""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    pending = False  # member started but not finished
+    try:
+        for chunk in chunks:
+            while chunk:
+                pending = True
+                out = decompressor.decompress(chunk, chunk_size)
+                if out:
+                    yield out
+                if decompressor.eof:
+                    # Concatenated gzip members: start over on the rest
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(GZIP_WBITS)
+                    pending = False
+                else:
+                    chunk = decompressor.unconsumed_tail
+    except zlib.error as e:
+        raise ValueError(f'invalid gzip body: {e}') from e
+    if pending:
+        raise ValueError('truncated gzip body')
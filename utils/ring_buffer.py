@@ -0,0 +1,70 @@
+"""
+Ring buffer for per-car speed history
+Stores speed, timestamp and coordinates in a compact NumPy array
+"""
+
+import numpy as np
+from datetime import datetime
+
+
+FIELDS = ('speed', 'timestamp', 'lat', 'lon')
+
+
+def to_epoch(timestamp):
+    """Convert an ISO timestamp string (or number) to epoch seconds, NaN if unparseable"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class SpeedHistory:
+    """
+    Fixed-capacity ring buffer with O(1) append
+    Every sample is written twice (at i and i + capacity), so the most recent
+    n samples are always a contiguous slice and tail() never copies
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.full((len(FIELDS), 2 * capacity), np.nan)
+        self.head = 0  # next write position in [0, capacity)
+        self.count = 0
+        
+    def __len__(self):
+        return self.count
+    
+    def append(self, speed, timestamp=np.nan, lat=np.nan, lon=np.nan):
+        """Add one sample, overwriting the oldest when full"""
+        sample = (speed, timestamp, lat, lon)
+        self.data[:, self.head] = sample
+        self.data[:, self.head + self.capacity] = sample
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+            
+    def tail(self, n, field='speed'):
+        """Zero-copy view of the last n values of a field (oldest first)"""
+        n = min(n, self.count)
+        end = self.head + self.capacity
+        return self.data[FIELDS.index(field), end - n:end]
+    
+    def last(self, field='speed'):
+        """Most recent value of a field"""
+        return self.data[FIELDS.index(field), self.head + self.capacity - 1]
+    
+    def load(self, samples):
+        """Replace the contents with samples, a [len(FIELDS), n] array (oldest first)"""
+        n = min(samples.shape[1], self.capacity)
+        self.clear()
+        self.data[:, :n] = samples[:, samples.shape[1] - n:]
+        self.data[:, self.capacity:self.capacity + n] = self.data[:, :n]
+        self.head = n % self.capacity
+        self.count = n
+    
+    def clear(self):
+        """Drop all samples"""
+        self.data.fill(np.nan)
+        self.head = 0
+        self.count = 0
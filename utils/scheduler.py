@@ -0,0 +1,122 @@
+"""
+Tick scheduler for the stream worker
+Ticks are due on an absolute grid (each deadline is the previous one plus the
+interval), so processing time does not stretch the period. Work time per tick
+is measured against the interval, and ticks that overrun it are skipped or
+coalesced instead of piling up
+"""
+
+from config import Config
+
+# Scheduler overrun policies
+SKIP = 'skip'  # drop missed deadlines, wait for the next one on the grid
+COALESCE = 'coalesce'  # run one tick right away standing in for all missed deadlines
+
+# EWMA weight of each tick in the mean work time
+WORK_TIME_ALPHA = 0.1
+
+
+class TickScheduler:
+    """
+    Absolute-deadline tick loop on a clock (utils.clock)
+    Deadlines are kept on clock.monotonic(), so wall-clock steps (NTP) neither
+    stall the loop nor trigger a burst of overruns
+    Usage:
+        scheduler.start()
+        while running:
+            ...tick work...
+            scheduler.wait()
+    interval: seconds per tick (None = Config.UPDATE_INTERVAL / Config.SIMULATION_SPEED,
+        re-read every tick so speed changes apply immediately)
+    """
+    POLICIES = (SKIP, COALESCE)
+
+    def __init__(self, clock, interval=None, policy=None):
+        policy = policy or Config.TICK_OVERRUN_POLICY
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown overrun policy '{policy}', expected one of {list(self.POLICIES)}")
+        self.clock = clock
+        self.interval = interval
+        self.policy = policy
+        self.deadline = None  # when the current tick was due
+        self.tick_start = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.overruns = 0  # ticks whose next deadline had already passed
+        self.skipped = 0  # deadlines dropped (skip policy)
+        self.coalesced = 0  # deadlines folded into a late tick (coalesce policy)
+        self.last_work = 0.0
+        self.mean_work = 0.0
+        self.max_work = 0.0
+        self.max_lateness = 0.0
+
+    def current_interval(self):
+        if self.interval is not None:
+            return self.interval
+        return Config.UPDATE_INTERVAL / Config.SIMULATION_SPEED
+
+    def start(self):
+        """Anchor the grid: the first tick is due now"""
+        self.deadline = self.tick_start = self.clock.monotonic()
+
+    def wait(self):
+        """
+        Finish the current tick and sleep until the next deadline
+        Returns: number of deadlines the next tick covers (1 unless coalesced)
+        """
+        if self.deadline is None:
+            self.start()
+            return 1
+        now = self.clock.monotonic()
+        interval = self.current_interval()
+        self._record_work(now - self.tick_start)
+
+        deadline = self.deadline + interval
+        covered = 1
+        if now > deadline:
+            # Overrun: `behind` deadlines (this one included) have already passed
+            behind = int((now - deadline) // interval) + 1
+            self.overruns += 1
+            if self.policy == SKIP:
+                self.skipped += behind
+                deadline += behind * interval
+            else:
+                self.coalesced += behind - 1
+                deadline += (behind - 1) * interval
+                covered = behind
+
+        self.deadline = deadline
+        if deadline > now:
+            self.clock.sleep(deadline - now)
+            self.tick_start = self.clock.monotonic()
+            # Wake-up delay past the deadline (sleep granularity, busy event loop)
+            self.max_lateness = max(self.max_lateness, self.tick_start - deadline)
+        else:
+            self.tick_start = now
+        return covered
+
+    def _record_work(self, work):
+        self.ticks += 1
+        self.last_work = work
+        self.max_work = max(self.max_work, work)
+        weight = max(1.0 / self.ticks, WORK_TIME_ALPHA)
+        self.mean_work += weight * (work - self.mean_work)
+
+    def get_status(self):
+        """Tick cadence and budget usage"""
+        interval = self.current_interval()
+        return {
+            'policy': self.policy,
+            'interval_s': interval,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'coalesced': self.coalesced,
+            'last_work_s': round(self.last_work, 4),
+            'mean_work_s': round(self.mean_work, 4),
+            'max_work_s': round(self.max_work, 4),
+            'utilization': round(self.mean_work / interval, 3) if interval else None,
+            'max_lateness_s': round(self.max_lateness, 4),
+        }
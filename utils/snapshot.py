@@ -0,0 +1,175 @@
+"""
+Detector state snapshots for Traffic Accident Detection System
+Periodically saves AccidentDetector state (detector statistics, speed
+history, predictor state, accident flags) to one uncompressed .npz file and
+loads it back at startup, so a restart does not have to warm every car up
+again. Copying state out of the detector is spread over ticks within a time
+budget per tick; the file is written by a background thread (a native one
+under eventlet, so merging and writing stay off the hub) and replaced
+atomically
+"""
+
+import os
+import threading
+import time
+import numpy as np
+from eventlet import patcher, tpool
+
+from config import Config
+
+# Cars copied per step between budget checks
+CHUNK_CARS = 256
+
+
+class DetectorSnapshotter:
+    """
+    Periodic snapshots of one AccidentDetector
+    Call step() once per tick while holding the detector lock; cars are
+    copied in chunks until the tick budget is spent, and a snapshot that
+    spans several ticks holds each car's state as of the tick it was copied
+    """
+    def __init__(self, detector, clock, path=None, interval=None, tick_budget=None, max_age=None):
+        self.detector = detector
+        self.clock = clock
+        self.path = path or Config.SNAPSHOT_PATH
+        self.interval = interval or Config.SNAPSHOT_INTERVAL
+        self.tick_budget = tick_budget if tick_budget is not None else Config.SNAPSHOT_TICK_BUDGET
+        self.max_age = max_age or Config.SNAPSHOT_MAX_AGE
+
+        self.next_due = None  # clock.monotonic() time of the next snapshot
+        self.pending = None  # car ids of the snapshot in progress
+        self.cursor = 0  # cars of `pending` already copied
+        self.chunks = []
+        self.writer = None
+
+        self.snapshots = 0
+        self.failed = 0
+        self.last_cars = 0
+        self.last_bytes = 0
+        self.last_capture_s = 0.0  # copy time summed over the ticks of the last snapshot
+        self.last_write_s = 0.0
+        self.last_error = None
+        self.restored = None  # summary of the startup restore
+
+    def restore(self):
+        """
+        Load the snapshot file into the detector if it exists and is recent enough
+        A snapshot that cannot be loaded (corrupt file, or taken with another
+        predictor configuration) is skipped and the detector starts cold
+        Returns: summary dict (restored cars, snapshot age, load time, or
+            why it was skipped) or None when there is no snapshot
+        """
+        if not os.path.exists(self.path):
+            return None
+        start = time.perf_counter()
+        try:
+            with np.load(self.path) as data:
+                state = {key: data[key] for key in data.files}
+            age = self.clock.time() - float(state.pop('saved_at'))
+            if age > self.max_age:
+                self.restored = {'cars': 0, 'age_s': round(age, 1), 'skipped': 'too old'}
+                return self.restored
+            cars = self.detector.restore(state)
+        except Exception as e:
+            # Anything from a truncated zip to a layout mismatch: never half-restore
+            self.detector.clear()
+            self.last_error = f"restore failed: {type(e).__name__}: {e}"
+            self.restored = {'cars': 0, 'skipped': self.last_error}
+            return self.restored
+        self.restored = {'cars': cars, 'age_s': round(age, 1),
+                         'elapsed_s': round(time.perf_counter() - start, 3)}
+        return self.restored
+
+    def step(self):
+        """Advance the snapshot schedule by one tick (cheap when nothing is due)"""
+        now = self.clock.monotonic()
+        if self.pending is None:
+            if self.next_due is None:
+                self.next_due = now + self.interval
+            if now < self.next_due or (self.writer is not None and self.writer.is_alive()):
+                return
+            self.next_due = now + self.interval
+            if not self.detector.detectors:
+                return
+            self.pending = list(self.detector.detectors)
+            self.cursor = 0
+            self.chunks = []
+            self.last_capture_s = 0.0
+
+        start = time.perf_counter()
+        while self.cursor < len(self.pending):
+            self.chunks.append(self.detector.snapshot(self.pending[self.cursor:self.cursor + CHUNK_CARS]))
+            self.cursor += CHUNK_CARS
+            if time.perf_counter() - start >= self.tick_budget:
+                break
+        self.last_capture_s += time.perf_counter() - start
+
+        if self.cursor >= len(self.pending):
+            chunks, self.chunks, self.pending = self.chunks, [], None
+            self.writer = threading.Thread(target=self._write_native, args=(chunks, self.clock.time()), daemon=True)
+            self.writer.start()
+
+    def save(self):
+        """Snapshot every car right away, writing in the calling thread (e.g. at shutdown)"""
+        self.pending = None
+        self.chunks = []
+        if self.detector.detectors:
+            self._write([self.detector.snapshot()], self.clock.time())
+
+    def _write_native(self, chunks, saved_at):
+        """
+        _write() on a native thread: once eventlet has patched threading, the
+        writer is a green thread and would merge and write on the hub
+        """
+        if patcher.is_monkey_patched('thread'):
+            tpool.execute(self._write, chunks, saved_at)
+        else:
+            self._write(chunks, saved_at)
+
+    def _write(self, chunks, saved_at):
+        start = time.perf_counter()
+        try:
+            state = merge(chunks)
+            state['saved_at'] = np.array(saved_at)
+            # np.savez appends .npz to names without it, so write through a file object
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'wb') as f:
+                np.savez(f, **state)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            return
+        self.snapshots += 1
+        self.last_cars = len(state['car_id'])
+        self.last_bytes = os.path.getsize(self.path)
+        self.last_write_s = time.perf_counter() - start
+
+    def get_status(self):
+        """Get snapshot status summary"""
+        return {
+            'path': self.path,
+            'snapshots': self.snapshots,
+            'failed': self.failed,
+            'in_progress': self.pending is not None,
+            'last_cars': self.last_cars,
+            'last_bytes': self.last_bytes,
+            'last_capture_s': round(self.last_capture_s, 4),
+            'last_write_s': round(self.last_write_s, 4),
+            'last_error': self.last_error,
+            'restored': self.restored,
+        }
+
+
+def merge(chunks):
+    """
+    Join AccidentDetector.snapshot() chunks into one snapshot
+    Per-car arrays are concatenated; scalars (predictor, rng state) come from the last chunk
+    """
+    merged = {}
+    for key, value in chunks[-1].items():
+        if value.ndim == 0:
+            merged[key] = value
+        else:
+            merged[key] = np.concatenate([chunk[key] for chunk in chunks if key in chunk])
+    return merged
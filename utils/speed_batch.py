@@ -0,0 +1,163 @@
+"""
+Columnar batch types for Traffic Accident Detection System
+Speed observations and detection results as parallel arrays (one row per
+observation) so whole ticks flow from simulator to detector to socket
+payloads without building a dict per car
+"""
+
+import numpy as np
+from utils.ring_buffer import to_epoch
+
+
+class SpeedBatch:
+    """
+    Columnar batch of speed observations
+    car_ids and timestamp_iso are lists; the other columns are NumPy arrays
+    """
+    def __init__(self, car_ids, speed, timestamp_iso, timestamp=None, lat=None, lon=None,
+                 confidence=None, is_accident=None, positions=None):
+        n = len(car_ids)
+        self.car_ids = car_ids
+        self.speed = np.asarray(speed, dtype=float)
+        self.timestamp_iso = timestamp_iso
+        self.timestamp = (np.asarray(timestamp, dtype=float) if timestamp is not None
+                          else _epochs(timestamp_iso))
+        self.lat = np.asarray(lat, dtype=float) if lat is not None else np.full(n, np.nan)
+        self.lon = np.asarray(lon, dtype=float) if lon is not None else np.full(n, np.nan)
+        self.confidence = confidence
+        self.is_accident = is_accident
+        self._positions = positions  # optional car_id -> row map supplied by the producer
+        
+    def __len__(self):
+        return len(self.car_ids)
+    
+    def position(self, car_id):
+        """Row of a car in this batch, or None"""
+        if self._positions is None:
+            self._positions = {car_id: i for i, car_id in enumerate(self.car_ids)}
+        return self._positions.get(car_id)
+    
+    def take(self, rows):
+        """Sub-batch with the given rows"""
+        rows = np.asarray(rows, dtype=np.intp)
+        pick = lambda column: column[rows] if column is not None else None
+        return SpeedBatch(
+            [self.car_ids[i] for i in rows.tolist()], self.speed[rows],
+            [self.timestamp_iso[i] for i in rows.tolist()], self.timestamp[rows],
+            self.lat[rows], self.lon[rows], pick(self.confidence), pick(self.is_accident))
+    
+    @classmethod
+    def from_records(cls, records):
+        """Build a batch from the list-of-dicts speed data format"""
+        car_ids = [d.get('car_id', 'unknown') for d in records]
+        locations = [d.get('location') or {} for d in records]
+        has_truth = bool(records) and all('is_accident' in d for d in records)
+        has_confidence = bool(records) and all('confidence' in d for d in records)
+        return cls(
+            car_ids,
+            [d['speed'] for d in records],
+            [d['timestamp'] for d in records],
+            lat=[loc.get('lat', np.nan) for loc in locations],
+            lon=[loc.get('lon', np.nan) for loc in locations],
+            confidence=np.array([d['confidence'] for d in records]) if has_confidence else None,
+            is_accident=np.array([d['is_accident'] for d in records], dtype=bool) if has_truth else None)
+    
+    def to_records(self):
+        """Adapter to the list-of-dicts speed data format"""
+        columns = [self.car_ids, self.timestamp_iso, self.speed.tolist(),
+                   self.lat.tolist(), self.lon.tolist()]
+        records = [
+            {
+                'car_id': car_id,
+                'timestamp': ts,
+                'speed': speed,
+                'location': {
+                    'lat': lat,
+                    'lon': lon
+                }
+            }
+            for car_id, ts, speed, lat, lon in zip(*columns)
+        ]
+        if self.confidence is not None:
+            for record, c in zip(records, self.confidence.tolist()):
+                record['confidence'] = c
+        if self.is_accident is not None:
+            for record, a in zip(records, self.is_accident.tolist()):
+                record['is_accident'] = a
+        return records
+
+
+class DetectionBatch:
+    """
+    Columnar detection results, row-aligned with the SpeedBatch they came from
+    """
+    # Result fields in record order
+    FIELDS = ('car_id', 'timestamp', 'speed', 'predicted_speed', 'cusum_stat', 'sprt_ratio',
+              'ph_stat', 'accident_detected', 'accident_active', 'accident_id', 'confidence')
+    
+    def __init__(self, batch, predicted_speed, cusum_stat, sprt_ratio, ph_stat,
+                 accident_detected, accident_active, accident_id, confidence):
+        self.batch = batch
+        self.car_ids = batch.car_ids
+        self.timestamp_iso = batch.timestamp_iso
+        self.speed = batch.speed
+        self.predicted_speed = predicted_speed
+        self.cusum_stat = cusum_stat
+        self.sprt_ratio = sprt_ratio
+        self.ph_stat = ph_stat
+        self.accident_detected = accident_detected
+        self.accident_active = accident_active
+        self.accident_id = accident_id
+        self.confidence = confidence
+        
+    def __len__(self):
+        return len(self.car_ids)
+    
+    def position(self, car_id):
+        return self.batch.position(car_id)
+    
+    def column(self, field):
+        """Column as a plain list (JSON-ready)"""
+        if field == 'car_id':
+            return self.car_ids
+        if field == 'timestamp':
+            return self.timestamp_iso
+        values = getattr(self, field)
+        return values.tolist() if isinstance(values, np.ndarray) else values
+    
+    def to_columns(self):
+        """Dict of field -> list, the columnar serialization"""
+        return {field: self.column(field) for field in self.FIELDS}
+    
+    def record(self, i):
+        """One result row as a dict"""
+        return {field: _item(self.column_value(field, i)) for field in self.FIELDS}
+    
+    def column_value(self, field, i):
+        if field == 'car_id':
+            return self.car_ids[i]
+        if field == 'timestamp':
+            return self.timestamp_iso[i]
+        return getattr(self, field)[i]
+    
+    def to_records(self):
+        """Adapter to the list-of-dicts detection result format"""
+        columns = [self.column(field) for field in self.FIELDS]
+        return [dict(zip(self.FIELDS, row)) for row in zip(*columns)]
+
+
+def _item(value):
+    """NumPy scalar -> Python scalar"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _epochs(timestamps):
+    """Epoch seconds for a list of timestamps, parsing each distinct value once"""
+    cache = {}
+    out = np.empty(len(timestamps))
+    for i, ts in enumerate(timestamps):
+        value = cache.get(ts)
+        if value is None:
+            value = cache[ts] = to_epoch(ts)
+        out[i] = value
+    return out
@@ -0,0 +1,229 @@
+"""
+PointA -> PointB travel times
+Joins entry and exit passages by car id, either streaming (bounded memory,
+for replay) or in bulk over parsed log columns, into a TravelTimes table
+sorted by exit time so interval statistics are sorted-array searches.
+CheckpointJoin pairs consecutive checkpoints of any network for the online
+segment detector (models/segment_detector.py)
+"""
+
+import numpy as np
+from collections import OrderedDict
+
+from config import Config
+
+
+class TravelTimeJoin:
+    """
+    Streaming hash join of entry and exit passages
+    Entries wait in an insertion-ordered dict keyed by car id. The oldest are
+    dropped once more than max_pending are waiting, or once they are older
+    than timeout seconds (cars that never reach the exit)
+    Passages must arrive in time order; times are float seconds
+    """
+    def __init__(self, entry=None, exit=None, max_pending=None, timeout=None):
+        self.entry = entry or Config.SEGMENT_ENTRY
+        self.exit = exit or Config.SEGMENT_EXIT
+        self.max_pending = max_pending or Config.TRAVEL_JOIN_MAX_PENDING
+        self.timeout = timeout or Config.TRAVEL_JOIN_TIMEOUT
+        self.pending = OrderedDict()  # car_id -> entry time
+        self.stats = {'matched': 0, 'expired': 0, 'evicted': 0, 'reentries': 0, 'orphan_exits': 0}
+
+    def add(self, timestamp, car_id, point):
+        """
+        Feed one passage
+        Returns: entry time if this passage completes a trip, else None
+        """
+        if point == self.entry:
+            self.expire(timestamp)
+            if self.pending.pop(car_id, None) is not None:
+                self.stats['reentries'] += 1
+            self.pending[car_id] = timestamp
+            if len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+                self.stats['evicted'] += 1
+            return None
+        if point != self.exit:
+            return None
+
+        entered = self.pending.pop(car_id, None)
+        if entered is None or timestamp - entered > self.timeout or timestamp < entered:
+            self.stats['orphan_exits'] += 1
+            return None
+        self.stats['matched'] += 1
+        return entered
+
+    def expire(self, now):
+        """Drop entries older than timeout"""
+        cutoff = now - self.timeout
+        pending = self.pending
+        while pending:
+            car_id, entered = next(iter(pending.items()))
+            if entered >= cutoff:
+                break
+            del pending[car_id]
+            self.stats['expired'] += 1
+
+    def join(self, passages):
+        """
+        Join an iterable of (timestamp, car_id, point) in one pass
+        Returns: TravelTimes
+        """
+        cars, entries, exits = [], [], []
+        for timestamp, car_id, point in passages:
+            entered = self.add(timestamp, car_id, point)
+            if entered is not None:
+                cars.append(car_id)
+                entries.append(entered)
+                exits.append(timestamp)
+        return TravelTimes(np.array(cars), entries, exits)
+
+
+class CheckpointJoin:
+    """
+    Streaming join of consecutive checkpoint passages over a road network
+    Every passage closes the trip from the same car's previous checkpoint, so
+    each consecutive pair of checkpoints is a segment. Each car's last
+    passage waits in an insertion-ordered dict (re-inserted on every passage,
+    so the front is always the stalest car) with the same max_pending and
+    timeout bounds as TravelTimeJoin; every passage costs O(1)
+    Passages must arrive in time order; times are float seconds
+    """
+    def __init__(self, max_pending=None, timeout=None):
+        self.max_pending = max_pending or Config.TRAVEL_JOIN_MAX_PENDING
+        self.timeout = timeout or Config.TRAVEL_JOIN_TIMEOUT
+        self.pending = OrderedDict()  # car_id -> (point, passage time)
+        self.stats = {'matched': 0, 'expired': 0, 'evicted': 0}
+
+    def add(self, timestamp, car_id, point):
+        """
+        Feed one passage
+        Returns: (previous point, previous passage time) if this passage
+            completes a segment trip, else None
+        """
+        self.expire(timestamp)
+        previous = self.pending.pop(car_id, None)
+        self.pending[car_id] = (point, timestamp)
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.stats['evicted'] += 1
+        if previous is None or previous[0] == point or timestamp < previous[1]:
+            return None
+        self.stats['matched'] += 1
+        return previous
+
+    def expire(self, now):
+        """Drop cars whose last passage is older than timeout"""
+        cutoff = now - self.timeout
+        pending = self.pending
+        while pending:
+            car_id, (_, passed) = next(iter(pending.items()))
+            if passed >= cutoff:
+                break
+            del pending[car_id]
+            self.stats['expired'] += 1
+
+
+def join_passages(columns, entry=None, exit=None, timeout=None):
+    """
+    Bulk join over parsed log columns (utils.log_parser.LogColumns)
+    Pairs each exit with the same car's immediately preceding passage when
+    that passage is an entry within timeout seconds; the columns need not be
+    time sorted. Unlike TravelTimeJoin nothing is evicted (the columns are
+    already in memory)
+    Returns: TravelTimes with car numbers and epoch-second times
+    """
+    entry_code = columns.point_code(entry or Config.SEGMENT_ENTRY)
+    exit_code = columns.point_code(exit or Config.SEGMENT_EXIT)
+    timeout = timeout or Config.TRAVEL_JOIN_TIMEOUT
+
+    passages = np.flatnonzero((columns.point == entry_code) | (columns.point == exit_code))
+    if entry_code < 0 or exit_code < 0 or not len(passages):
+        return TravelTimes(np.array([], dtype=np.int64), [], [])
+    seconds = columns.seconds()[passages]
+    car = columns.car[passages]
+    point = columns.point[passages]
+
+    # Each car's passages in time order, then pair adjacent entry -> exit
+    order = np.lexsort((seconds, car))
+    seconds, car, point = seconds[order], car[order], point[order]
+    pair = ((car[1:] == car[:-1]) & (point[:-1] == entry_code) & (point[1:] == exit_code)
+            & (seconds[1:] - seconds[:-1] <= timeout))
+    first = np.flatnonzero(pair)
+    return TravelTimes(car[first], seconds[first], seconds[first + 1])
+
+
+class TravelTimes:
+    """
+    Completed trips as parallel arrays sorted by exit time
+    car: car ids; entry, exit: float seconds; duration: exit - entry seconds
+    """
+    def __init__(self, car, entry, exit, reported=None, _sorted=False):
+        car = np.asarray(car)
+        entry = np.asarray(entry, dtype=float)
+        exit = np.asarray(exit, dtype=float)
+        if not _sorted:
+            order = np.argsort(exit, kind='stable')
+            car, entry, exit = car[order], entry[order], exit[order]
+            reported = reported[order] if reported is not None else None
+        self.car = car
+        self.entry = entry
+        self.exit = exit
+        self.duration = exit - entry
+        self.reported = reported  # optional bool per trip, see mark_reported()
+        self._entry_order = None
+
+    def __len__(self):
+        return len(self.exit)
+
+    def mark_reported(self, car_ids):
+        """Flag trips whose car appears in car_ids (e.g. cars that filed a report)"""
+        self.reported = np.isin(self.car, np.asarray(list(car_ids), dtype=self.car.dtype))
+        return self
+
+    def take(self, rows):
+        """Subset of trips (rows must keep exit order, e.g. a slice)"""
+        reported = self.reported[rows] if self.reported is not None else None
+        return TravelTimes(self.car[rows], self.entry[rows], self.exit[rows], reported, _sorted=True)
+
+    def window(self, start, end):
+        """Trips that exited in [start, end)"""
+        lo, hi = np.searchsorted(self.exit, [start, end], side='left')
+        return self.take(slice(lo, hi))
+
+    def entry_order(self):
+        """Row order by entry time (computed once)"""
+        if self._entry_order is None:
+            self._entry_order = np.argsort(self.entry, kind='stable')
+        return self._entry_order
+
+    def interval_edges(self, width, by='exit', start=None, end=None):
+        """
+        Interval boundaries of width seconds covering the trips
+        by: 'exit' or 'entry' time
+        """
+        times = self._times(by)
+        if not len(times):
+            return np.array([])
+        start = times.min() if start is None else start
+        end = times.max() if end is None else end
+        count = max(int(np.ceil((end - start) / width)), 1)
+        return start + width * np.arange(count + 1)
+
+    def interval_bounds(self, edges, by='exit'):
+        """
+        Row bounds per interval: rows bounds[i]:bounds[i + 1] of the trips
+        sorted by `by` time fall in [edges[i], edges[i + 1])
+        For by='entry' the rows index entry_order()
+        """
+        times = self._times(by)
+        if by == 'entry':
+            times = times[self.entry_order()]
+        return np.searchsorted(times, edges, side='left')
+
+    def _times(self, by):
+        if by == 'exit':
+            return self.exit
+        if by == 'entry':
+            return self.entry
+        raise ValueError(f"Unknown time '{by}', expected 'exit' or 'entry'")